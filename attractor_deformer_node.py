@@ -3,16 +3,103 @@ import maya.OpenMaya as om
 import maya.OpenMayaMPx as ommpx
 import maya.cmds as cmds
 
+from deformer_utils import np, point_array_to_numpy, vector_array_to_numpy, numpy_to_point_array, iterator_indices, input_geometry, matrix_values, \
+    create_fingerprint_attributes, FingerprintCache, PaintWeightCache, BufferPool, AllocationCounter, create_allocation_attributes, count_allocations, \
+    matrix_to_numpy, node_is_disabled, parallel_compute, create_lod_attributes, playback_lod_ratio, \
+    register_playback_callback, deregister_playback_callback, create_frame_cache_attributes
+
+if np is not None:
+    import deformer_kernels
+    import deformer_executor
+    import deformer_lod
+    from spatial_grid import UniformGrid
+
+
+class AttractorGeometryCache(object):
+    """
+        保存一个输入几何体的原始顶点位置、法线、空间索引和世界矩阵的逆矩阵
+        几何体部分只在输入的点或者拓扑真的改变时重建(比较校验值)，逆矩阵只在世界矩阵改变时重新计算
+    """
+
+    def __init__(self, geo_iter, input_geom):
+        self.points = om.MPointArray()
+        geo_iter.allPositions(self.points) # 一次性获取迭代器中所有顶点的位置
+        self.count = self.points.length()
+
+        self.positions = point_array_to_numpy(self.points)
+
+        mesh_fn = om.MFnMesh(input_geom)
+        normals = om.MFloatVectorArray()  # 用来存取inputgeom的顶点的所有浮点法线
+        mesh_fn.getVertexNormals(False, normals) # False的作用是不要average normal
+        self.normals = vector_array_to_numpy(normals)
+
+        # 变形器只作用于部分顶点时，迭代器的顺序和顶点序号不一致，需要单独取出序号
+        self.vertex_count = mesh_fn.numVertices()
+        self.indices = iterator_indices(geo_iter, self.vertex_count)
+        self.normals = self.normals[self.indices]
+
+        self.grid = UniformGrid(self.positions)
+
+        self.input_state = None  # 创建缓存时输入几何体的状态(FingerprintCache.input_state)
+
+        self.world_matrix = None
+        self.world_inverse_matrix = None
+
+        # 上一次计算的结果，用来在目标点移动时只更新受影响的区域
+        self.output_points = None
+        self.output_positions = None  # output_points的numpy副本，改变的顶点很多时整体转换后写入output_points
+        self.last_targets = None
+        self.last_max_distances = None
+
+        # envelope为1时移动了的顶点和它们的位置，只有envelope改变时在原始位置和这个结果之间插值
+        self.moved_vertices = None
+        self.rest_positions = None  # 移动了的顶点的原始位置
+        self.full_positions = None
+        self.lerp_positions = None  # 插值结果的数组，在只有envelope改变的多次计算之间重复使用
+        self.output_envelope = None  # output_points使用的envelope
+        self.weight_map = None  # output_points使用的绘制权重
+        self.lod = None  # output_points使用的简化计算，为None时是完整计算
+
+        self.lod_interpolation = None  # 播放时使用的顶点子集和插值矩阵，第一次使用时创建
+
+    def playback_lod(self, ratio):
+        """ 返回子集比例为ratio的LodInterpolation，只在第一次使用或者比例改变时创建 """
+        if self.lod_interpolation is None or self.lod_interpolation.ratio != ratio:
+            self.lod_interpolation = deformer_lod.LodInterpolation(self.positions, ratio)
+        return self.lod_interpolation
+
+    def inverse_matrix(self, world_matrix):
+        """ 返回世界矩阵的逆矩阵，世界矩阵没有改变时直接返回缓存的结果 """
+        if self.world_matrix is None or not self.world_matrix == world_matrix:
+            self.world_matrix = om.MMatrix(world_matrix)
+            self.world_inverse_matrix = world_matrix.inverse()
+        return self.world_inverse_matrix
+
+
 class AttractorDeformerNode(ommpx.MPxDeformerNode):
 
     TYPE_NAME = "attractordeformernode"
     TYPE_ID = om.MTypeId(0x0007F7FE)
 
-    MAX_ANGLE = 0.5 * 3.14159265 # 90度
+    MAX_ANGLE = 0.5 * 3.14159265 # 90度，和deformer_kernels.ATTRACTOR_MAX_ANGLE一致
+    BULK_WRITE_FRACTION = 1.0 / 16  # 改变的顶点超过这个比例时整体转换输出，不逐个设置MPointArray的元素
+
+    # 计算方式
+    MODE_PER_VERTEX = 0  # 逐顶点计算(参考实现)
+    MODE_VECTORIZED = 1  # 使用numpy批量计算
+    MODE_PARALLEL_GEOMETRY = 2  # 在compute中一次计算所有几何体，几何体之间在线程池中并行
 
     def __init__(self):
         super(AttractorDeformerNode, self).__init__()
 
+        self.geometry_caches = {}  # 以multi_index为键的几何体缓存
+
+        self.fingerprints = FingerprintCache(AttractorDeformerNode.fingerprint_hits, AttractorDeformerNode.fingerprint_misses)
+        self.paint_weights = PaintWeightCache()
+        self.buffers = BufferPool()  # 在多次计算之间重复使用的数组
+        self.allocations = AllocationCounter(AttractorDeformerNode.allocation_blocks, AttractorDeformerNode.allocation_peak_bytes)
+
+    @count_allocations
     def deform(self, data_block, geo_iter, world_matrix, multi_index):
         """
             变形的逻辑
@@ -27,49 +114,277 @@ class AttractorDeformerNode(ommpx.MPxDeformerNode):
         if envelope == 0:
             return    
         
-        max_distance = data_block.inputValue(AttractorDeformerNode.max_distance).asFloat()
-        if max_distance == 0:
+        target_positions, max_distances = self.target_list(data_block)  # 所有目标点的世界空间位置和最大距离
+        if not target_positions:
             return
 
-        target_position = data_block.inputValue(AttractorDeformerNode.target_position).asFloatVector()
-        target_position = om.MPoint(target_position) * world_matrix.inverse() # 将目标位置转换为局部空间下的数值
-        target_position = om.MFloatVector(target_position) # 获取目标位置在局部空间下的floatVector
+        evaluation_mode = data_block.inputValue(AttractorDeformerNode.evaluation_mode).asShort()
+        lod_ratio = playback_lod_ratio(self, data_block, AttractorDeformerNode.playback_lod, AttractorDeformerNode.lod_ratio)
+        self.fingerprints.use_frame_cache(self, data_block, AttractorDeformerNode.frame_cache, AttractorDeformerNode.frame_cache_budget)
 
-        input_handle = data_block.outputArrayValue(self.input) # 使用outputArray代替inputArray以避免重新计算（外网翻译）
-        input_handle.jumpToElement(multi_index)
-        input_element_handle = input_handle.outputValue()
+        # 输入和上一次一致时直接使用上一次的输出
+        input_state = self.fingerprints.input_state(data_block, multi_index)
+        fingerprint = self.geometry_fingerprint(geo_iter, world_matrix, input_state,
+                                                (envelope, evaluation_mode, target_positions, max_distances, lod_ratio))
+        if self.fingerprints.restore(data_block, multi_index, fingerprint, geo_iter):
+            return
 
-        input_geom = input_element_handle.child(self.inputGeom).asMesh()
-        mesh_fn = om.MFnMesh(input_geom)
+        if evaluation_mode != AttractorDeformerNode.MODE_PER_VERTEX and np is not None:
+            cache = self.geometry_cache(data_block, geo_iter, multi_index, input_state)
+            inverse_matrix = cache.inverse_matrix(world_matrix)
+            # 将目标位置转换为局部空间下的数值
+            targets = np.array([[pt.x, pt.y, pt.z] for pt in (target_position * inverse_matrix for target_position in target_positions)])
+            weight_map = self.paint_weights.weight_map(data_block, multi_index, cache.vertex_count, cache.indices)
+            lod = cache.playback_lod(lod_ratio) if lod_ratio is not None else None
+            self.deform_vectorized(geo_iter, targets, np.array(max_distances), cache, envelope, weight_map, lod)
+        else:
+            inverse_matrix = world_matrix.inverse()
+            target_positions = [om.MFloatVector(target_position * inverse_matrix) for target_position in target_positions] # 获取目标位置在局部空间下的floatVector
+
+            input_geom = input_geometry(data_block, multi_index)
+            mesh_fn = om.MFnMesh(input_geom)
+
+            normals = self.buffers.array(("normals", multi_index), om.MFloatVectorArray)  # 用来存取inputgeom的顶点的所有浮点法线
+            mesh_fn.getVertexNormals(False, normals) # False的作用是不要average normal
+
+            self.deform_per_vertex(data_block, geo_iter, multi_index, target_positions, max_distances, normals, envelope)
+
+        self.fingerprints.store(multi_index, fingerprint, geo_iter)
+
+    def compute(self, plug, data_block):
+        """ parallelGeometry模式下一次计算所有几何体，其余的情况交给MPxDeformerNode逐个调用deform """
+        if plug.attribute() != ommpx.cvar.MPxGeometryFilter_outputGeom or np is None or node_is_disabled(self, data_block) or \
+                data_block.inputValue(AttractorDeformerNode.evaluation_mode).asShort() != AttractorDeformerNode.MODE_PARALLEL_GEOMETRY:
+            return ommpx.MPxDeformerNode.compute(self, plug, data_block)
+
+        # 所有几何体共用的部分只计算一次: envelope，目标点的列表和世界空间位置
+        envelope = data_block.inputValue(self.envelope).asFloat()
+        target_positions, max_distances = self.target_list(data_block)
+        lod_ratio = playback_lod_ratio(self, data_block, AttractorDeformerNode.playback_lod, AttractorDeformerNode.lod_ratio)
+        self.fingerprints.use_frame_cache(self, data_block, AttractorDeformerNode.frame_cache, AttractorDeformerNode.frame_cache_budget)
+        shared = (envelope, AttractorDeformerNode.MODE_PARALLEL_GEOMETRY, target_positions, max_distances, lod_ratio)
+        world_targets = np.array([[pt.x, pt.y, pt.z] for pt in target_positions]).reshape(-1, 3)
+        max_distance_array = np.array(max_distances)
+
+        def prepare(geo_iter, world_matrix, multi_index):
+            if envelope == 0 or not target_positions:
+                return None
+
+            input_state = self.fingerprints.input_state(data_block, multi_index)
+            fingerprint = self.geometry_fingerprint(geo_iter, world_matrix, input_state, shared)
+            if self.fingerprints.restore(data_block, multi_index, fingerprint, geo_iter):
+                return None
+
+            cache = self.geometry_cache(data_block, geo_iter, multi_index, input_state)
+            targets = deformer_kernels.transform_points(world_targets, matrix_to_numpy(cache.inverse_matrix(world_matrix)))
+            weight_map = self.paint_weights.weight_map(data_block, multi_index, cache.vertex_count, cache.indices)
+            lod = cache.playback_lod(lod_ratio) if lod_ratio is not None else None
+
+            def job():
+                return self.vectorized_update(targets, max_distance_array, cache, envelope, weight_map, lod)
+
+            def finish(update):
+                self.apply_update(geo_iter, cache, update)
+                self.fingerprints.store(multi_index, fingerprint, geo_iter)
+
+            return job, finish
+
+        with self.allocations:
+            parallel_compute(self, data_block, prepare)
+        self.allocations.publish(data_block)
+        data_block.setClean(plug)
+
+    def geometry_fingerprint(self, geo_iter, world_matrix, input_state, shared):
+        """
+            一个几何体的输入指纹，input_state是FingerprintCache.input_state的结果
+            shared是(envelope, 计算方式, 目标位置, 最大距离, 简化计算的比例)
+        """
+        envelope, evaluation_mode, target_positions, max_distances, lod_ratio = shared
+        return (envelope, evaluation_mode, lod_ratio, self.fingerprints.weights_generation,
+                tuple((pt.x, pt.y, pt.z) for pt in target_positions), tuple(max_distances),
+                matrix_values(world_matrix), input_state, geo_iter.count())
 
-        normals = om.MFloatVectorArray()  # 用来存取inputgeom的顶点的所有浮点法线
-        mesh_fn.getVertexNormals(False, normals) # False的作用是不要average normal
+    def target_list(self, data_block):
+        """
+            获取所有生效的目标点，targetPosition和maximumDistance是第一个目标点，targets数组中的是其余的目标点
+        Returns:
+            (list, list): 世界空间下的目标位置(MPoint)，每个目标点的最大距离。最大距离为0的目标点会被忽略
+        """
+        target_positions = []
+        max_distances = []
 
+        max_distance = data_block.inputValue(AttractorDeformerNode.max_distance).asFloat()
+        if max_distance > 0:
+            target_positions.append(om.MPoint(data_block.inputValue(AttractorDeformerNode.target_position).asFloatVector()))
+            max_distances.append(max_distance)
 
+        targets_handle = data_block.inputArrayValue(AttractorDeformerNode.targets)
+        for i in range(targets_handle.elementCount()):
+            targets_handle.jumpToArrayElement(i)
+            element_handle = targets_handle.inputValue()
+
+            max_distance = element_handle.child(AttractorDeformerNode.target_max_distance).asFloat()
+            if max_distance > 0:
+                target_positions.append(om.MPoint(element_handle.child(AttractorDeformerNode.target_point).asFloatVector()))
+                max_distances.append(max_distance)
+
+        return target_positions, max_distances
+
+    def deform_per_vertex(self, data_block, geo_iter, multi_index, target_positions, max_distances, normals, envelope=1.0):
+        """ 逐顶点计算的参考实现，用来和向量化的结果进行对比 """
         geo_iter.reset()
         while not geo_iter.isDone():
+            weight = self.weightValue(data_block, multi_index, geo_iter.index()) # 获取绘制的权重值
+            if weight == 0:
+                geo_iter.next() # 权重为0的顶点不移动
+                continue
+
             # 顶点迭代器所获取的位置都是在局部空间下的位置
             pt_local = geo_iter.position()
 
-            target_vector = target_position - om.MFloatVector(pt_local)
+            normal = normals[geo_iter.index()] # 局部空间下的顶点的法线浮点向量
 
-            distance = target_vector.length()
+            total_offset = om.MVector() # 所有目标点对这个顶点的偏移之和
+            moved = False
+            for target_position, max_distance in zip(target_positions, max_distances):
 
-            if distance <= max_distance:
+                target_vector = target_position - om.MFloatVector(pt_local)
 
-                normal = normals[geo_iter.index()] # 局部空间下的顶点的法线浮点向量
+                distance = target_vector.length()
 
-                angle = normal.angle(target_vector)  # 顶点的法线与顶点与目标点的向量之间的角度
-                if angle <= AttractorDeformerNode.MAX_ANGLE:
+                if distance <= max_distance:
 
-                    offset = target_vector * ((max_distance-distance)/max_distance)
+                    angle = normal.angle(target_vector)  # 顶点的法线与顶点与目标点的向量之间的角度
+                    if angle <= AttractorDeformerNode.MAX_ANGLE:
 
-                    new_pt_local = pt_local + om.MVector(offset)  # 局部空间下的新顶点位置
+                        offset = target_vector * ((max_distance-distance)/max_distance)
 
-                    geo_iter.setPosition(new_pt_local)
+                        total_offset += om.MVector(offset)
+                        moved = True
+
+            if moved:
+                new_pt_local = pt_local + total_offset * (envelope * weight)  # 局部空间下的新顶点位置
+
+                geo_iter.setPosition(new_pt_local)
 
             geo_iter.next()
 
+    def deform_vectorized(self, geo_iter, targets, max_distances, cache, envelope=1.0, weight_map=None, lod=None):
+        """
+            使用numpy一次性计算所有目标点范围内的顶点
+            每个目标点只查询它范围内的顶点，所有(顶点, 目标点)的组合在一次批量计算中完成
+            缓存中保存了上一次的输出，只有上一次和这一次的影响范围内的顶点需要更新
+            目标点没有变化、只有envelope改变时，不重新计算，只在原始位置和完整强度的结果之间插值
+        Args:
+            geo_iter (_type_): 针对geometry的顶点迭代器
+            targets (numpy.ndarray): (k, 3)的局部空间下的目标位置
+            max_distances (numpy.ndarray): (k,)的每个目标点的最大影响距离
+            cache (AttractorGeometryCache): 输入几何体的缓存
+            envelope (float): 总权重
+            weight_map (WeightMap): 绘制的权重，权重为0的顶点不参与计算。为None时所有顶点的权重为1
+            lod (LodInterpolation): 播放时只计算顶点子集，其余顶点插值得到。为None时完整计算
+        """
+        update = self.vectorized_update(targets, max_distances, cache, envelope, weight_map, lod)
+        self.apply_update(geo_iter, cache, update)
+
+    def vectorized_update(self, targets, max_distances, cache, envelope=1.0, weight_map=None, lod=None):
+        """
+            deform_vectorized中只使用numpy的部分，不调用maya的api，可以在线程池中运行
+        Returns:
+            tuple: (是否需要从原始位置重新开始, 需要恢复原始位置的顶点, 移动了的顶点, 新位置)，输出和上一次一致时返回None
+        """
+        reset = cache.output_points is None or weight_map is not cache.weight_map # 绘制的权重改变了，所有顶点重新计算
+        cache.weight_map = weight_map
+
+        targets_changed = reset or lod is not cache.lod or not np.array_equal(targets, cache.last_targets) or \
+            not np.array_equal(max_distances, cache.last_max_distances)
+        cache.lod = lod
+        if not targets_changed and envelope == cache.output_envelope:
+            return None # 目标点没有变化，直接使用上一次的输出
+
+        stale_vertices = np.empty(0, dtype=np.intp)
+        if targets_changed:
+            candidates, owners = deformer_kernels.attractor_candidates(cache.grid, targets, max_distances)
+            weights = None
+            if weight_map is not None:
+                weights = weight_map.values
+                if weight_map.is_sparse():
+                    painted = weight_map.mask[candidates]
+                    candidates, owners = candidates[painted], owners[painted]
+            if lod is not None:
+                # 播放时只计算子集中的顶点
+                in_subset = lod.subset_mask[candidates]
+                candidates, owners = candidates[in_subset], owners[in_subset]
+            # 顶点很多时按顶点范围分块在线程池中计算
+            moved_vertices, full_positions = deformer_executor.default_executor().attractor_pairs(cache.positions, cache.normals, targets,
+                                                                                                  max_distances, candidates, owners, weights)
+            if lod is not None:
+                if weight_map is None:
+                    moved_vertices, full_positions = lod.interpolate(cache.positions, moved_vertices, full_positions)
+                else:
+                    moved_vertices, full_positions = lod.interpolate(cache.positions, moved_vertices, full_positions,
+                                                                     weight_map.values, weight_map.mask)
+
+            if not reset:
+                # 上一次移动了的顶点先恢复到原始位置，其余的顶点和上一次的输出一致
+                stale_vertices = np.setdiff1d(cache.moved_vertices, moved_vertices)
+
+            cache.moved_vertices = moved_vertices
+            cache.rest_positions = cache.positions[moved_vertices]
+            cache.full_positions = full_positions
+            cache.lerp_positions = np.empty_like(full_positions)
+            cache.last_targets = targets
+            cache.last_max_distances = max_distances
+
+        new_positions = cache.full_positions
+        if envelope != 1:
+            new_positions = deformer_kernels.lerp(cache.rest_positions, cache.full_positions, envelope, cache.lerp_positions)
+        cache.output_envelope = envelope
+
+        return reset, stale_vertices, cache.moved_vertices, new_positions
+
+    def apply_update(self, geo_iter, cache, update):
+        """
+            在主线程中把vectorized_update的结果写入缓存的输出，再一次性写回
+            只有少数顶点改变时逐个修改output_points，否则更新numpy副本后整体转换
+        """
+        if update is not None:
+            reset, stale_vertices, moved_vertices, new_positions = update
+            if reset:
+                cache.output_positions = cache.positions.copy()
+            cache.output_positions[stale_vertices] = cache.positions[stale_vertices]
+            cache.output_positions[moved_vertices] = new_positions
+
+            if reset or len(stale_vertices) + len(moved_vertices) > cache.count * AttractorDeformerNode.BULK_WRITE_FRACTION:
+                cache.output_points = numpy_to_point_array(cache.output_positions, cache.output_points)
+            else:
+                for index, pt in zip(stale_vertices.tolist(), cache.positions[stale_vertices].tolist()):
+                    cache.output_points.set(index, pt[0], pt[1], pt[2])
+                for index, pt in zip(moved_vertices.tolist(), new_positions.tolist()):
+                    cache.output_points.set(index, pt[0], pt[1], pt[2])
+
+        geo_iter.setAllPositions(cache.output_points) # 一次性写回
+
+    def geometry_cache(self, data_block, geo_iter, multi_index, input_state):
+        """
+            获取multi_index对应的几何体缓存，输入的状态(mesh是点位置的校验值)和创建缓存时不一致时重新创建
+            inputGeom只是被标记为dirty(dgdirty、播放停止、点没有移动的上游历史)时不重建法线、空间索引和简化计算
+            在其他上下文中计算(例如bakePointCache)时不会标记dirty，所以每次都比较输入的状态，不依赖setDependentsDirty
+        """
+        cache = self.geometry_caches.get(multi_index)
+        if cache is None or cache.input_state != input_state or cache.count != geo_iter.count():
+            cache = AttractorGeometryCache(geo_iter, input_geometry(data_block, multi_index))
+            cache.input_state = input_state
+            self.geometry_caches[multi_index] = cache
+        return cache
+
+    def setDependentsDirty(self, plug, plug_array):
+        """ 记录inputGeom和绘制权重被标记为dirty，几何体缓存在每次计算时比较输入的状态 """
+        self.fingerprints.dirty(plug)
+        self.paint_weights.dirty(plug)
+
+        return ommpx.MPxDeformerNode.setDependentsDirty(self, plug, plug_array)
+
     def accessoryAttribute(self):
         """ 返回要辅助修改的属性 """
         return AttractorDeformerNode.target_position
@@ -123,14 +438,63 @@ class AttractorDeformerNode(ommpx.MPxDeformerNode):
         cls.target_position = numeric_attr.createPoint("targetPosition", "targetPos")
         numeric_attr.setKeyable(True)
 
+        # 额外的目标点数组，每个元素有自己的位置和最大距离
+        cls.target_point = numeric_attr.createPoint("targetPoint", "tgtPt")
+        numeric_attr.setKeyable(True)
+
+        cls.target_max_distance = numeric_attr.create("targetMaximumDistance", "tgtMaxDist", om.MFnNumericData.kFloat, 1.0)
+        numeric_attr.setKeyable(True)
+        numeric_attr.setMin(0.0)
+        numeric_attr.setMax(2.0)
+
+        compound_attr = om.MFnCompoundAttribute()
+        cls.targets = compound_attr.create("targets", "tgts")
+        compound_attr.addChild(cls.target_point)
+        compound_attr.addChild(cls.target_max_distance)
+        compound_attr.setArray(True)
+        compound_attr.setUsesArrayDataBuilder(True)
+
+        cls.playback_lod, cls.lod_ratio = create_lod_attributes()
+
+        enum_attr = om.MFnEnumAttribute()
+        cls.evaluation_mode = enum_attr.create("evaluationMode", "evalMode", cls.MODE_VECTORIZED)
+        enum_attr.addField("perVertex", cls.MODE_PER_VERTEX)
+        enum_attr.addField("vectorized", cls.MODE_VECTORIZED)
+        enum_attr.addField("parallelGeometry", cls.MODE_PARALLEL_GEOMETRY)
+        enum_attr.setKeyable(False)
+        enum_attr.setChannelBox(True)
+
         cls.addAttribute(cls.max_distance)
         cls.addAttribute(cls.target_position)
+        cls.addAttribute(cls.targets)
+        cls.addAttribute(cls.evaluation_mode)
+        cls.addAttribute(cls.playback_lod)
+        cls.addAttribute(cls.lod_ratio)
+
+        # 按帧缓存输出，不影响计算结果，所以不需要attributeAffects
+        cls.frame_cache, cls.frame_cache_budget = create_frame_cache_attributes()
+        cls.addAttribute(cls.frame_cache)
+        cls.addAttribute(cls.frame_cache_budget)
+
+        cls.fingerprint_hits, cls.fingerprint_misses = create_fingerprint_attributes()
+        cls.addAttribute(cls.fingerprint_hits)
+        cls.addAttribute(cls.fingerprint_misses)
+
+        cls.allocation_blocks, cls.allocation_peak_bytes = create_allocation_attributes()
+        cls.addAttribute(cls.allocation_blocks)
+        cls.addAttribute(cls.allocation_peak_bytes)
 
         #变形器节点具有默认的outputGeom属性，因此我们没必要再创建一个输出的属性，我们可以直接利用这个默认的outputGemo属性
         output_geom = ommpx.cvar.MPxGeometryFilter_outputGeom  
 
         cls.attributeAffects(cls.max_distance, output_geom)
         cls.attributeAffects(cls.target_position,output_geom)
+        cls.attributeAffects(cls.targets, output_geom)
+        cls.attributeAffects(cls.target_point, output_geom)
+        cls.attributeAffects(cls.target_max_distance, output_geom)
+        cls.attributeAffects(cls.evaluation_mode, output_geom)
+        cls.attributeAffects(cls.playback_lod, output_geom)
+        cls.attributeAffects(cls.lod_ratio, output_geom)
 
 def initializePlugin(plugin):
     """ 插件加载时执行这个函数"""
@@ -149,10 +513,12 @@ def initializePlugin(plugin):
         om.MGlobal.displayError("Failed to register node: {0}".format(AttractorDeformerNode.TYPE_NAME))
     
     cmds.makePaintable(AttractorDeformerNode.TYPE_NAME, "weights", attrType="multiFloat", shapeMode = "deformer") # 使其能绘制权重
+    register_playback_callback() # 播放停止时恢复完整的计算
 
 def uninitializePlugin(plugin):
     """ 插件取消加载时执行这个函数"""
     cmds.makePaintable(AttractorDeformerNode.TYPE_NAME, "weights",remove=True) # 移除使其能绘制权重
+    deregister_playback_callback()
     plugin_fn = ommpx.MFnPlugin(plugin)
     try:
         plugin_fn.deregisterNode(AttractorDeformerNode.TYPE_ID)
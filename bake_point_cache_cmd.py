@@ -0,0 +1,151 @@
+# coding: utf-8
+# 在一个时间范围内逐帧计算变形器(或mesh)的输出，保存为pointcachedeformernode可以播放的缓存文件
+import time
+
+import maya.api.OpenMaya as om
+import maya.cmds as cmds
+
+import numpy as np
+
+from point_cache import PointCacheWriter
+
+
+def maya_useNewAPI():
+    """ 告知maya,使用的是maya api 2.0 """
+    pass
+
+
+def output_plug(node_obj, index):
+    """ 变形器使用outputGeom[index]，mesh使用outMesh """
+    node_fn = om.MFnDependencyNode(node_obj)
+    if node_fn.hasAttribute("outputGeom"):
+        return node_fn.findPlug("outputGeom", False).elementByLogicalIndex(index)
+    if node_fn.hasAttribute("outMesh"):
+        return node_fn.findPlug("outMesh", False)
+    raise RuntimeError("{0} has neither outputGeom nor outMesh".format(node_fn.name()))
+
+
+def evaluate_points(plug, frame):
+    """ 在frame这一帧计算plug上的mesh，返回(n, 3)的顶点位置，不改变场景的当前时间 """
+    context = om.MDGContext(om.MTime(frame, om.MTime.uiUnit()))
+    if hasattr(om, "MDGContextGuard"):
+        with om.MDGContextGuard(context):
+            mesh_obj = plug.asMObject()
+    else:
+        mesh_obj = plug.asMObject(context)  # 2018及之前的版本
+    return np.array(om.MFnMesh(mesh_obj).getPoints(), dtype=np.float64).reshape(-1, 4)[:, :3]
+
+
+class BakePointCacheCmd(om.MPxCommand):
+    """
+        bakePointCache -file "D:/cache/attractor.ptc" -startTime 1 -endTime 120 attractordeformernode1
+        不指定时间时使用时间滑块的播放范围，返回写入的帧数
+        每一帧在主线程中计算，后台线程同时把上一帧写入磁盘
+    """
+    COMMAND_NAME = "bakePointCache"
+    # 定义命令的标志
+    FILE_FLAG = ["-f", "-file", om.MSyntax.kString]
+    START_FLAG = ["-st", "-startTime", om.MSyntax.kDouble]
+    END_FLAG = ["-et", "-endTime", om.MSyntax.kDouble]
+    STEP_FLAG = ["-by", "-step", om.MSyntax.kDouble]
+    INDEX_FLAG = ["-i", "-index", om.MSyntax.kLong]
+
+    def __init__(self):
+        super(BakePointCacheCmd, self).__init__()
+
+    def doIt(self, arg_list):
+        try:
+            arg_db = om.MArgDatabase(self.syntax(), arg_list) # 创建对象解析语法与参数
+        except:
+            self.displayError("Error parsing arguments")
+            raise
+
+        if not arg_db.isFlagSet(BakePointCacheCmd.FILE_FLAG[0]):
+            raise RuntimeError("-file is required")
+        file_path = arg_db.flagArgumentString(BakePointCacheCmd.FILE_FLAG[0], 0)
+
+        start = om.MAnimControl.minTime().asUnits(om.MTime.uiUnit())
+        end = om.MAnimControl.maxTime().asUnits(om.MTime.uiUnit())
+        step = 1.0
+        index = 0
+        if arg_db.isFlagSet(BakePointCacheCmd.START_FLAG[0]):
+            start = arg_db.flagArgumentDouble(BakePointCacheCmd.START_FLAG[0], 0)
+        if arg_db.isFlagSet(BakePointCacheCmd.END_FLAG[0]):
+            end = arg_db.flagArgumentDouble(BakePointCacheCmd.END_FLAG[0], 0)
+        if arg_db.isFlagSet(BakePointCacheCmd.STEP_FLAG[0]):
+            step = arg_db.flagArgumentDouble(BakePointCacheCmd.STEP_FLAG[0], 0)
+        if arg_db.isFlagSet(BakePointCacheCmd.INDEX_FLAG[0]):
+            index = arg_db.flagArgumentInt(BakePointCacheCmd.INDEX_FLAG[0], 0)
+        if step <= 0 or end < start:
+            raise RuntimeError("Invalid frame range {0} to {1} by {2}".format(start, end, step))
+
+        plug = output_plug(arg_db.getObjectList().getDependNode(0), index)
+        frame_count = int((end - start) / step + 1e-6) + 1
+
+        began = time.time()
+        points = evaluate_points(plug, start)
+        with PointCacheWriter(file_path, len(points), start, step) as writer:
+            writer.write_frame(points)
+            for i in range(1, frame_count):
+                points = evaluate_points(plug, start + i * step)
+                writer.write_frame(points)
+
+        om.MGlobal.displayInfo("Baked {0} frames of {1} points to {2} in {3:.2f}s".format(
+            frame_count, len(points), file_path, time.time() - began))
+        self.setResult(frame_count)
+
+    @classmethod
+    def creator(cls):
+        """ 注册maya命令时使用的方法，用来得到类的实例 """
+        return BakePointCacheCmd()
+
+    @classmethod
+    def create_syntax(cls):
+
+        syntax = om.MSyntax()
+
+        syntax.addFlag(*cls.FILE_FLAG)
+        syntax.addFlag(*cls.START_FLAG)
+        syntax.addFlag(*cls.END_FLAG)
+        syntax.addFlag(*cls.STEP_FLAG)
+        syntax.addFlag(*cls.INDEX_FLAG)
+
+        # 要烘焙的变形器或者mesh
+        syntax.setObjectType(om.MSyntax.kSelectionList, 1, 1)
+        syntax.useSelectionAsDefault(True)
+
+        return syntax
+
+
+def initializePlugin(plugin):
+    """ 插件加载时执行这个函数"""
+    vendor = "RuiChen"  # 插件制作人的名字
+    version = "1.0.0"  # 插件的版本
+
+    plugin_fn = om.MFnPlugin(plugin, vendor, version)  # 定义插件
+
+    try:
+        plugin_fn.registerCommand(BakePointCacheCmd.COMMAND_NAME, BakePointCacheCmd.creator, BakePointCacheCmd.create_syntax)
+    except:
+        om.MGlobal.displayError("Failed to register command: {0}".format(BakePointCacheCmd.COMMAND_NAME))  # 注册失败时输出
+
+
+def uninitializePlugin(plugin):
+    """ 插件取消加载时执行这个函数 """
+    plugin_fn = om.MFnPlugin(plugin)
+    try:
+        plugin_fn.deregisterCommand(BakePointCacheCmd.COMMAND_NAME)  # 取消注册新命令
+    except:
+        om.MGlobal.displayError("Failed to deregister command: {0}".format(BakePointCacheCmd.COMMAND_NAME))  # 取消注册失败时输出
+
+
+if __name__ == '__main__':
+    plugin_name = "bake_point_cache_cmd.py"  # 插件的文件名
+    # 如果插件加载了就先取消加载插件
+    cmds.evalDeferred(
+        'if cmds.pluginInfo("{0}", q=True, loaded=True): cmds.unloadPlugin("{0}")'.format(plugin_name))
+    # 如果插件没有加载就加载插件
+    cmds.evalDeferred(
+        'if not cmds.pluginInfo("{0}", q=True, loaded=True): cmds.loadPlugin("{0}")'.format(plugin_name))
+
+    cmds.evalDeferred('cmds.bakePointCache("attractordeformernode1", file="C:/Users/Administrator/Documents/maya/2018/plug-ins/test_scene/attractor_test.ptc", startTime=1, endTime=120)')
@@ -3,6 +3,12 @@ import maya.OpenMaya as om
 import maya.OpenMayaMPx as ommpx
 import maya.cmds as cmds
 
+from deformer_utils import np, point_array_to_numpy, numpy_to_point_array, matrix_to_numpy, matrix_values, iterator_indices, input_geometry, \
+    create_fingerprint_attributes, FingerprintCache, BufferPool, AllocationCounter, create_allocation_attributes, count_allocations
+
+if np is not None:
+    import deformer_executor
+
 class BasicDeformerNode(ommpx.MPxDeformerNode):
 
     TYPE_NAME = "basicdeformernode"
@@ -11,27 +17,69 @@ class BasicDeformerNode(ommpx.MPxDeformerNode):
     def __init__(self):
         super(BasicDeformerNode, self).__init__()
 
+        self.fingerprints = FingerprintCache(BasicDeformerNode.fingerprint_hits, BasicDeformerNode.fingerprint_misses)
+        self.buffers = BufferPool()  # 在多次计算之间重复使用的数组
+        self.allocations = AllocationCounter(BasicDeformerNode.allocation_blocks, BasicDeformerNode.allocation_peak_bytes)
+
+    @count_allocations
     def deform(self, data_block, geo_iter, matrix, multi_index):
         
         envelope = data_block.inputValue(self.envelope).asFloat() # 总权重
 
         if envelope == 0:
             return
-        
-        geo_iter.reset() # 重置迭代器
-        while not geo_iter.isDone():
 
-            if geo_iter.index() % 2 == 0:
-                pt = geo_iter.position()
-                # 局部空间
-                #pt.y += (2*envelope)
+        # 输入和上一次一致时直接使用上一次的输出
+        fingerprint = (envelope, matrix_values(matrix), self.fingerprints.input_state(data_block, multi_index), geo_iter.count())
+        if self.fingerprints.restore(data_block, multi_index, fingerprint, geo_iter):
+            return
+
+        if np is not None:
+            self.deform_vectorized(geo_iter, matrix, multi_index, self.vertex_count(data_block, multi_index))
+        else:
+            geo_iter.reset() # 重置迭代器
+            while not geo_iter.isDone():
+
+                if geo_iter.index() % 2 == 0:
+                    pt = geo_iter.position()
+                    # 局部空间
+                    #pt.y += (2*envelope)
 
-                # 世界空间
-                pt = pt * matrix * 1
+                    # 世界空间
+                    pt = pt * matrix * 1
 
-                geo_iter.setPosition(pt)
+                    geo_iter.setPosition(pt)
 
-            geo_iter.next()    
+                geo_iter.next()    
+
+        self.fingerprints.store(multi_index, fingerprint, geo_iter)
+
+    def deform_vectorized(self, geo_iter, matrix, multi_index=0, vertex_count=None):
+        """
+            把顶点位置转换为numpy数组，交给deformer_kernels计算，顶点数很多时分块在线程池中计算
+            vertex_count是几何体的顶点数，迭代器包含所有顶点时不需要逐个获取顶点序号
+        """
+        points = self.buffers.array(("points", multi_index), om.MPointArray)
+        geo_iter.allPositions(points) # 一次性获取迭代器中所有顶点的位置
+
+        positions = point_array_to_numpy(points)
+        indices = iterator_indices(geo_iter, vertex_count)
+        result = deformer_executor.default_executor().basic_deform(positions, indices, matrix_to_numpy(matrix),
+                                                                   self.buffers.numpy_array(("result", multi_index), positions.shape))
+
+        geo_iter.setAllPositions(numpy_to_point_array(result, points)) # 一次性写回
+
+    def vertex_count(self, data_block, multi_index):
+        """ 输入mesh的顶点数，输入不是mesh时返回None """
+        input_geom = input_geometry(data_block, multi_index)
+        if input_geom.isNull() or not input_geom.hasFn(om.MFn.kMeshData):
+            return None
+        return om.MFnMesh(input_geom).numVertices()
+
+    def setDependentsDirty(self, plug, plug_array):
+        """ 记录inputGeom被标记为dirty，用于输入指纹 """
+        self.fingerprints.dirty(plug)
+        return ommpx.MPxDeformerNode.setDependentsDirty(self, plug, plug_array)
         
     @classmethod
     def creator(cls):
@@ -39,7 +87,13 @@ class BasicDeformerNode(ommpx.MPxDeformerNode):
     
     @classmethod
     def initialize(cls):
-        pass
+        cls.fingerprint_hits, cls.fingerprint_misses = create_fingerprint_attributes()
+        cls.addAttribute(cls.fingerprint_hits)
+        cls.addAttribute(cls.fingerprint_misses)
+
+        cls.allocation_blocks, cls.allocation_peak_bytes = create_allocation_attributes()
+        cls.addAttribute(cls.allocation_blocks)
+        cls.addAttribute(cls.allocation_peak_bytes)
 
 def initializePlugin(plugin):
     """ 插件加载时执行这个函数"""
@@ -0,0 +1,280 @@
+# coding: utf-8
+"""
+    变形器计算核心的性能测试，不需要maya，在普通的python + numpy环境中运行
+
+    使用方法:
+        python benchmarks/deformer_benchmark.py                       # 运行并和baseline.json对比
+        python benchmarks/deformer_benchmark.py --save-baseline       # 运行并保存为新的baseline
+        python benchmarks/deformer_benchmark.py --sizes 1000 100000 --kernels attractor
+
+    每个测试分为几个阶段:
+        fetch   把点数据从python列表转换为numpy数组(对应节点中MPointArray转换为numpy数组)
+        index   创建空间索引(attractor)或者稀疏差值(sparse_blend)，节点中只在输入几何体或目标改变时执行
+        compute 计算核心
+        write   把结果转换回python列表(对应节点中写回MPointArray)
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # 变形器的模块都在仓库的根目录
+
+import deformer_kernels
+from spatial_grid import UniformGrid
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000, 2000000]
+KERNELS = ["attractor", "blend", "sparse_blend", "basic"]
+SPARSE_BLEND_TARGETS = 4  # sparse_blend的目标数
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def sphere_mesh(vertex_count):
+    """ 在单位球面上均匀分布的顶点(斐波那契球)，法线就是顶点位置 """
+    i = np.arange(vertex_count, dtype=np.float64) + 0.5
+    phi = np.arccos(1.0 - 2.0 * i / vertex_count)
+    theta = np.pi * (1.0 + 5.0 ** 0.5) * i
+    points = np.column_stack([np.cos(theta) * np.sin(phi), np.sin(theta) * np.sin(phi), np.cos(phi)])
+    return points, points.copy()
+
+
+def painted_weights(points, rng):
+    """ 模拟绘制的权重：几块圆形区域内平滑过渡，其余大部分顶点权重为0 """
+    weights = np.zeros(len(points))
+    for center in rng.normal(size=(4, 3)):
+        center /= np.linalg.norm(center)
+        distance = np.linalg.norm(points - center, axis=1)
+        falloff = np.clip(1.0 - distance / 0.6, 0.0, 1.0)
+        weights = np.maximum(weights, falloff * falloff * (3.0 - 2.0 * falloff)) # smoothstep
+    return weights
+
+
+def attractor_targets(rng, count=4):
+    """ 在球面外侧附近放置目标点 """
+    directions = rng.normal(size=(count, 3))
+    directions /= np.linalg.norm(directions, axis=1)[:, np.newaxis]
+    return directions * 1.1, np.full(count, 0.3)
+
+
+def blend_target(points, normals, rng):
+    """ 模拟雕刻的目标模型：一部分区域沿法线鼓起 """
+    bulge = painted_weights(points, rng)
+    return points + normals * (0.1 * bulge)[:, np.newaxis]
+
+
+class PhaseTimer(object):
+    """
+        记录每个阶段的耗时，trace为True时记录每个阶段中分配的峰值内存
+        tracemalloc会明显拖慢python对象的分配，所以计时和内存统计分开运行
+    """
+
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.timings = {}
+        self.peak_memory = 0
+
+    def run(self, phase, func, *args):
+        if self.trace:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = func(*args)
+        self.timings[phase] = self.timings.get(phase, 0.0) + time.perf_counter() - start
+        if self.trace:
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1] - base)
+        return result
+
+
+def fetch(point_list):
+    return np.array(point_list, dtype=np.float64).reshape(-1, 3)
+
+
+def write_back(points):
+    return points.tolist()
+
+
+def run_attractor(timer, point_list, normal_list, rng):
+    targets, max_distances = attractor_targets(rng)
+    points = timer.run("fetch", fetch, point_list)
+    normals = timer.run("fetch", fetch, normal_list)
+    grid = timer.run("index", UniformGrid, points)
+
+    def compute():
+        candidates, owners = deformer_kernels.attractor_candidates(grid, targets, max_distances)
+        moved_vertices, new_positions = deformer_kernels.attractor_pairs(points, normals, targets, max_distances,
+                                                                         candidates, owners)
+        result = points.copy()
+        result[moved_vertices] = new_positions
+        return result
+
+    result = timer.run("compute", compute)
+    timer.run("write", write_back, result)
+
+
+def run_blend(timer, point_list, target_list, weights):
+    source = timer.run("fetch", fetch, point_list)
+    target = timer.run("fetch", fetch, target_list)
+    result = timer.run("compute", deformer_kernels.blend_deform, source, target, weights, 0.8)
+    timer.run("write", write_back, result)
+
+
+def run_sparse_blend(timer, point_list, target_lists, weights):
+    """ 和节点中的向量化计算一致: 多个目标的稀疏差值按权重累加，只计算绘制权重不为0的顶点 """
+    points = timer.run("fetch", fetch, point_list)
+    targets = [timer.run("fetch", fetch, target_list) for target_list in target_lists]
+
+    def build_deltas():
+        return [deformer_kernels.sparse_deltas(points, target) + (1.0,) for target in targets]
+
+    sparse_targets = timer.run("index", build_deltas)
+    target_weights = np.linspace(0.25, 1.0, len(sparse_targets))
+    mask = weights != 0
+
+    def compute():
+        moved_vertices, new_positions = deformer_kernels.sparse_blend(points, sparse_targets, target_weights, weights, mask)
+        result = points.copy()
+        result[moved_vertices] = new_positions
+        return result
+
+    result = timer.run("compute", compute)
+    timer.run("write", write_back, result)
+
+
+def run_basic(timer, point_list, matrix):
+    points = timer.run("fetch", fetch, point_list)
+    indices = np.arange(len(points))
+    result = timer.run("compute", deformer_kernels.basic_deform, points, indices, matrix)
+    timer.run("write", write_back, result)
+
+
+def benchmark(kernel, vertex_count, repeat):
+    """ 运行repeat次，返回最快的一次的结果 """
+    rng = np.random.default_rng(vertex_count)
+    points, normals = sphere_mesh(vertex_count)
+    point_list = points.tolist()
+
+    if kernel == "attractor":
+        args = (point_list, normals.tolist(), rng)
+        func = run_attractor
+    elif kernel == "blend":
+        args = (point_list, blend_target(points, normals, rng).tolist(), painted_weights(points, rng))
+        func = run_blend
+    elif kernel == "sparse_blend":
+        target_lists = [blend_target(points, normals, rng).tolist() for _ in range(SPARSE_BLEND_TARGETS)]
+        args = (point_list, target_lists, painted_weights(points, rng))
+        func = run_sparse_blend
+    else:
+        matrix = np.eye(4)
+        matrix[3, :3] = (0.0, 2.0, 0.0)
+        args = (point_list, matrix)
+        func = run_basic
+
+    best = None
+    for _ in range(repeat):
+        timer = PhaseTimer()
+        func(timer, *args)
+
+        total = sum(timer.timings.values())
+        if best is None or total < best["total_seconds"]:
+            best = {
+                "kernel": kernel,
+                "vertices": vertex_count,
+                "total_seconds": total,
+                "phases": timer.timings,
+                "vertices_per_second": vertex_count / timer.timings["compute"],
+            }
+
+    timer = PhaseTimer(trace=True)
+    tracemalloc.start()
+    try:
+        func(timer, *args)
+    finally:
+        tracemalloc.stop()
+    best["peak_memory_bytes"] = timer.peak_memory
+    return best
+
+
+def result_key(result):
+    return "{0}/{1}".format(result["kernel"], result["vertices"])
+
+
+def compare(results, baseline, tolerance):
+    """ 和baseline对比compute阶段的每秒顶点数，返回变慢超过tolerance的结果 """
+    regressions = []
+    for result in results:
+        reference = baseline.get(result_key(result))
+        if reference is None:
+            continue
+        ratio = result["vertices_per_second"] / reference["vertices_per_second"]
+        result["baseline_ratio"] = ratio
+        if ratio < 1.0 - tolerance:
+            regressions.append(result)
+    return regressions
+
+
+def print_results(results):
+    header = "{0:<12} {1:>9} {2:>14} {3:>10} {4:>10} {5:>10} {6:>10} {7:>11} {8:>8}"
+    print(header.format("kernel", "vertices", "verts/s", "fetch ms", "index ms", "compute ms", "write ms", "peak MB", "vs base"))
+    for result in results:
+        phases = result["phases"]
+        ratio = result.get("baseline_ratio")
+        print(header.format(result["kernel"],
+                            result["vertices"],
+                            "{0:.3e}".format(result["vertices_per_second"]),
+                            "{0:.2f}".format(phases.get("fetch", 0.0) * 1000),
+                            "{0:.2f}".format(phases.get("index", 0.0) * 1000),
+                            "{0:.2f}".format(phases.get("compute", 0.0) * 1000),
+                            "{0:.2f}".format(phases.get("write", 0.0) * 1000),
+                            "{0:.1f}".format(result["peak_memory_bytes"] / 1048576.0),
+                            "-" if ratio is None else "{0:.2f}x".format(ratio)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the deformer kernels on synthetic meshes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="vertex counts to test")
+    parser.add_argument("--kernels", nargs="+", choices=KERNELS, default=KERNELS)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the fastest one is reported")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown of verts/s compared to the baseline (0.2 = 20%%)")
+    parser.add_argument("--json", help="also write the raw results to this file")
+    args = parser.parse_args(argv)
+
+    results = [benchmark(kernel, size, args.repeat) for kernel in args.kernels for size in args.sizes]
+
+    regressions = []
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+
+    print_results(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {
+            "machine": {"platform": platform.platform(), "python": platform.python_version(), "numpy": np.__version__},
+            "results": dict((result_key(result), result) for result in results),
+        }
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print("Saved baseline to {0}".format(args.baseline))
+
+    if regressions:
+        print("Regressions: {0}".format(", ".join(result_key(result) for result in regressions)))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+# coding: utf-8
+"""
+    ChunkedExecutor在一个大模型上的多线程扩展性测试，不需要maya
+
+    使用方法:
+        python benchmarks/executor_scaling.py                             # 200万顶点，线程数1, 2, 4...到cpu核数
+        python benchmarks/executor_scaling.py --size 1000000 --workers 1 2 8 --chunk-size 32768
+
+    只统计compute阶段(空间索引和数据转换不分块)，每个线程数的结果和第一个线程数(默认是1)对比得到加速比
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # 变形器的模块都在仓库的根目录
+
+import deformer_kernels
+from deformer_executor import ChunkedExecutor
+from spatial_grid import UniformGrid
+
+from deformer_benchmark import sphere_mesh, painted_weights, attractor_targets, blend_target
+
+KERNELS = ["attractor", "blend", "sparse_blend", "basic"]
+
+
+def default_workers():
+    """ 1, 2, 4...直到cpu核数 """
+    count = multiprocessing.cpu_count()
+    workers = [1]
+    while workers[-1] * 2 < count:
+        workers.append(workers[-1] * 2)
+    if workers[-1] != count:
+        workers.append(count)
+    return workers
+
+
+def kernel_case(kernel, points, normals, rng):
+    """ 返回func(executor, out)，准备工作(目标、空间索引、稀疏差值)不计入时间 """
+    if kernel == "attractor":
+        targets, max_distances = attractor_targets(rng, count=16)
+        max_distances = max_distances * 2.0 # 扩大影响范围，让每个目标有足够多的顶点
+        grid = UniformGrid(points)
+        weights = painted_weights(points, rng)
+        return lambda executor, out: executor.attractor_deform(points, normals, grid, targets, max_distances, weights, out)
+
+    if kernel == "blend":
+        target = blend_target(points, normals, rng)
+        weights = painted_weights(points, rng)
+        return lambda executor, out: executor.blend_deform(points, target, weights, 0.8, out)
+
+    if kernel == "sparse_blend":
+        weights = painted_weights(points, rng)
+        sparse_targets = []
+        for _ in range(4):
+            indices, deltas = deformer_kernels.sparse_deltas(points, blend_target(points, normals, rng), 1e-6)
+            sparse_targets.append((indices, deltas, 1.0))
+        target_weights = [0.25, 0.5, 0.75, 1.0]
+        return lambda executor, out: executor.sparse_blend(points, sparse_targets, target_weights, weights)
+
+    matrix = np.eye(4)
+    matrix[3, :3] = (0.0, 2.0, 0.0)
+    indices = np.arange(len(points))
+    return lambda executor, out: executor.basic_deform(points, indices, matrix, out)
+
+
+def measure(func, executor, out, repeat):
+    """ 运行repeat次，返回最快的一次的秒数 """
+    func(executor, out) # 预热，创建线程池
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(executor, out)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure how the chunked kernels scale with worker threads.")
+    parser.add_argument("--size", type=int, default=2000000, help="vertex count of the test mesh")
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers(), help="worker counts to test")
+    parser.add_argument("--chunk-size", type=int, default=ChunkedExecutor.CHUNK_SIZE, help="vertices per chunk")
+    parser.add_argument("--kernels", nargs="+", choices=KERNELS, default=KERNELS)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the fastest one is reported")
+    parser.add_argument("--json", help="also write the raw results to this file")
+    args = parser.parse_args(argv)
+
+    points, normals = sphere_mesh(args.size)
+    out = np.empty_like(points)
+
+    results = []
+    header = "{0:<13} {1:>8} {2:>12} {3:>9}"
+    print(header.format("kernel", "workers", "compute ms", "speedup"))
+    for kernel in args.kernels:
+        func = kernel_case(kernel, points, normals, np.random.default_rng(args.size))
+        single = None
+        for workers in args.workers:
+            executor = ChunkedExecutor(args.chunk_size, workers)
+            try:
+                seconds = measure(func, executor, out, args.repeat)
+            finally:
+                executor.close()
+            if single is None:
+                single = seconds # 和第一个线程数(默认是1)对比
+            result = {"kernel": kernel, "vertices": args.size, "workers": workers, "chunk_size": args.chunk_size,
+                      "seconds": seconds, "speedup": single / seconds}
+            results.append(result)
+            print(header.format(kernel, workers, "{0:.2f}".format(seconds * 1000), "{0:.2f}x".format(result["speedup"])))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
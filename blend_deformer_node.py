@@ -1,16 +1,217 @@
 # coding: utf-8
+import os
+
 import maya.OpenMaya as om
 import maya.OpenMayaMPx as ommpx
 import maya.cmds as cmds
 
+from deformer_utils import np, point_array_to_numpy, numpy_to_point_array, iterator_indices, input_geometry, mesh_checksum, \
+    create_fingerprint_attributes, FingerprintCache, PaintWeightCache, BufferPool, AllocationCounter, create_allocation_attributes, count_allocations, \
+    node_is_disabled, parallel_compute, create_lod_attributes, playback_lod_ratio, register_playback_callback, deregister_playback_callback, \
+    create_frame_cache_attributes
+
+if np is not None:
+    import deformer_kernels
+    import deformer_executor
+    import deformer_lod
+    from spatial_grid import UniformGrid
+
+class MeshTarget(object):
+    """ 连接到blendMesh或blendTargetMesh的目标mesh """
+
+    def __init__(self, mesh_obj):
+        self.mesh_obj = mesh_obj
+
+    def checksum(self):
+        return mesh_checksum(self.mesh_obj)
+
+    def point_array(self, target_points=None):
+        """ 目标的所有点(MPointArray)，target_points是用来接收的数组，为None时创建新的数组 """
+        if target_points is None:
+            target_points = om.MPointArray() # 定义一个接受目标mesh所有点的数组
+
+        target_mesh_fn = om.MFnMesh(self.mesh_obj) # 定义一个目标mesh的函数集
+        target_mesh_fn.getPoints(target_points) # 使用函数集的方法将点放入到点数组中
+        return target_points
+
+    def read(self):
+        """
+        Returns:
+            (numpy.ndarray, tuple): (m, 3)的目标位置，目标的拓扑
+        """
+        mesh_fn = om.MFnMesh(self.mesh_obj)
+        topology = (mesh_fn.numVertices(), mesh_fn.numPolygons(), mesh_fn.numFaceVertices())
+        return point_array_to_numpy(self.point_array()), topology
+
+
+class FileTarget(object):
+    """ targetFile中的一个目标，数据通过内存映射读取，只有用到的目标才会被操作系统读入内存 """
+
+    def __init__(self, targets_array, index, file_state):
+        self.targets_array = targets_array
+        self.index = index
+        self.file_state = file_state
+
+    def checksum(self):
+        return self.file_state
+
+    def point_array(self, target_points=None):
+        return numpy_to_point_array(self.targets_array[self.index], target_points)
+
+    def read(self):
+        return np.asarray(self.targets_array[self.index], dtype=np.float64), (self.targets_array.shape[1],)
+
+
+class BlendGeometryCache(object):
+    """
+        保存一个输入几何体的原始顶点位置，和每个目标相对于原始位置的稀疏差值(只保存有变化的顶点)
+        输入几何体的状态改变了时重建，目标mesh被标记为dirty时先比较校验值，只有真的改变了才重新计算
+    """
+
+    def __init__(self, geo_iter, input_geom, input_state, correspondences=None):
+        """
+        Args:
+            input_state: 创建缓存时输入几何体的状态(FingerprintCache.input_state)
+            correspondences (dict): 节点中这个multi_index的最近点对应，输入的点移动后重建缓存时继续使用
+        """
+        self.points = om.MPointArray()
+        geo_iter.allPositions(self.points) # 一次性获取迭代器中所有顶点的位置
+        self.count = self.points.length()
+
+        self.positions = point_array_to_numpy(self.points)
+        self.vertex_count = om.MFnMesh(input_geom).numVertices()
+        self.indices = iterator_indices(geo_iter, self.vertex_count) # 迭代器中每个位置对应的顶点序号
+        self.input_state = input_state
+
+        self.target_deltas = {}  # 目标的键 -> (目标的校验值, (是否使用最近点对应, 存储方式), (有变化的顶点在迭代器中的位置, 差值数据, 缩放值))
+        self.unverified_targets = set()  # 被标记为dirty，需要比较校验值的目标
+        self.correspondences = {} if correspondences is None else correspondences  # 目标的键 -> (目标mesh的拓扑, 迭代器的顶点数, 每个顶点在目标mesh上最近的顶点序号)
+        self.storage_reports = {}  # 目标的键 -> (压缩节省的字节数, 最大还原误差)
+
+        # envelope为1时的完整结果: (每个目标的稀疏差值, 目标权重, 绘制权重, 简化计算, 移动了的顶点, 原始位置, 完整强度的位置)
+        self.full_result = None
+
+        self.lod_interpolation = None  # 播放时使用的顶点子集和插值矩阵，第一次使用时创建
+
+    def sparse_deltas(self, key, target, closest_point=False, storage=0):
+        """
+            获取目标的稀疏差值，没有缓存或者目标改变了时重新计算
+        Args:
+            key: 目标的键
+            target (MeshTarget or FileTarget): 目标
+            closest_point (bool): 为True时使用最近点对应，目标的顶点数和顺序可以和输入几何体不同
+            storage (int): 差值的存储方式，deformer_kernels.DELTA_STORAGE_*
+        Returns:
+            (numpy.ndarray, numpy.ndarray, float): 有变化的顶点在迭代器中的位置，差值数据，缩放值。按顶点序号对应时顶点数不一致返回None
+        """
+        entry = self.target_deltas.get(key)
+        if key in self.unverified_targets:
+            self.unverified_targets.discard(key)
+            if entry is not None and (entry[0] is None or entry[0] != target.checksum()):
+                entry = None
+        settings = (closest_point, storage)
+        if entry is not None and entry[1] != settings:
+            entry = None
+
+        if entry is None:
+            target_positions, topology = target.read()
+
+            if closest_point:
+                target_positions = target_positions[self.correspondence(key, target_positions, topology)]
+            elif len(target_positions) != self.vertex_count:
+                return None
+            else:
+                target_positions = target_positions[self.indices]
+
+            indices, deltas = deformer_kernels.sparse_deltas(self.positions, target_positions, BlendDeformerNode.DELTA_TOLERANCE)
+            data, scale = deformer_kernels.quantize_deltas(deltas, storage)
+            entry = (target.checksum(), settings, (indices.astype(np.int32), data, scale))
+            self.target_deltas[key] = entry
+
+            if storage != deformer_kernels.DELTA_STORAGE_FLOAT64:
+                saved_bytes, max_error = deformer_kernels.quantization_error(deltas, data, scale)
+                self.storage_reports[key] = (saved_bytes, max_error)
+                om.MGlobal.displayInfo("Blend target {0}: {1} deltas stored as {2}, saved {3} bytes, max error {4:.3g}".format(
+                    key, len(indices), data.dtype.name, saved_bytes, max_error))
+            else:
+                self.storage_reports.pop(key, None)
+        return entry[2]
+
+    def full_factor(self, sparse_targets, target_weights, weight_map, lod=None):
+        """
+            目标的差值和绘制权重没有重新读取过，并且目标权重和完整结果使用的权重成比例时，返回这个比例
+            输出就是在原始位置和完整结果之间按比例 * envelope插值，否则返回None(需要重新计算完整结果)
+        """
+        if self.full_result is None or self.full_result[2] is not weight_map or self.full_result[3] is not lod:
+            return None
+
+        full_targets, full_weights = self.full_result[:2]
+        if len(full_targets) != len(sparse_targets) or \
+                any(full_target is not sparse_target for full_target, sparse_target in zip(full_targets, sparse_targets)):
+            return None
+        if not len(full_weights):
+            return 1.0
+
+        reference = np.argmax(np.abs(full_weights))
+        factor = target_weights[reference] / full_weights[reference]
+        if not np.allclose(target_weights, full_weights * factor, rtol=1e-9, atol=0.0):
+            return None
+        return factor
+
+    def playback_lod(self, ratio):
+        """ 返回子集比例为ratio的LodInterpolation，只在第一次使用或者比例改变时创建 """
+        if self.lod_interpolation is None or self.lod_interpolation.ratio != ratio:
+            self.lod_interpolation = deformer_lod.LodInterpolation(self.positions, ratio)
+        return self.lod_interpolation
+
+    def correspondence(self, key, target_positions, topology):
+        """
+            每个顶点在目标mesh上最近的顶点序号
+            只在第一次使用这个目标(绑定)或者目标、输入几何体的拓扑改变时计算
+            之后目标或者输入的点移动了也继续使用
+        """
+        entry = self.correspondences.get(key)
+        if entry is None or entry[0] != topology or entry[1] != self.count:
+            grid = UniformGrid(target_positions, points_per_cell=2)
+            nearest, _ = grid.nearest(self.positions)
+            entry = (topology, self.count, nearest.astype(np.int32))
+            self.correspondences[key] = entry
+        return entry[2]
+
+
 class BlendDeformerNode(ommpx.MPxDeformerNode):
 
     TYPE_NAME = "blenddeformernode"
     TYPE_ID = om.MTypeId(0x0007F7FD)
 
+    # 计算方式
+    MODE_PER_VERTEX = 0  # 逐顶点计算(参考实现)
+    MODE_VECTORIZED = 1  # 使用numpy批量计算
+    MODE_PARALLEL_GEOMETRY = 2  # 在compute中一次计算所有几何体，几何体之间在线程池中并行
+
+    # 目标mesh和输入几何体的顶点对应方式
+    CORRESPONDENCE_VERTEX_INDEX = 0  # 按顶点序号对应，要求拓扑相同
+    CORRESPONDENCE_CLOSEST_POINT = 1  # 按绑定时的最近点对应，拓扑可以不同(只用于vectorized)
+
+    BLEND_MESH_KEY = -1  # blendMesh作为第一个目标时使用的键，blendTargets中的目标使用数组的序号作为键
+    FILE_KEY = "file"  # targetFile中的目标使用(FILE_KEY, 目标序号)作为键
+    DELTA_TOLERANCE = 1e-6  # 差值小于这个值的顶点认为没有变化
+
     def __init__(self):
         super(BlendDeformerNode, self).__init__()
 
+        self.geometry_caches = {}  # 以multi_index为键的几何体缓存
+
+        self.target_file = None  # (文件状态, 内存映射的目标数组)
+        self.correspondences = {}  # multi_index -> {目标的键: 最近点对应}，不随几何体缓存重建
+        self.target_checksums = {}  # 目标mesh的键 -> 校验值，只在目标被标记为dirty时重新计算
+
+        self.fingerprints = FingerprintCache(BlendDeformerNode.fingerprint_hits, BlendDeformerNode.fingerprint_misses)
+        self.paint_weights = PaintWeightCache()
+        self.buffers = BufferPool()  # 在多次计算之间重复使用的数组
+        self.allocations = AllocationCounter(BlendDeformerNode.allocation_blocks, BlendDeformerNode.allocation_peak_bytes)
+
+    @count_allocations
     def deform(self, data_block, geo_iter, matrix, multi_index):
         """
             变形的逻辑
@@ -25,35 +226,344 @@ class BlendDeformerNode(ommpx.MPxDeformerNode):
         if envelope == 0:
             return    
 
-        blend_weight = data_block.inputValue(self.blend_weight).asFloat() # 获取混合的权重值
-        if blend_weight == 0:
+        targets = self.target_list(data_block)  # 所有生效的目标
+        if not targets:
             return
 
-        target_mesh = data_block.inputValue(self.blend_mesh).asMesh()  # 获取目标mesh
-        if target_mesh.isNull():
+        settings = self.settings(data_block)
+        evaluation_mode, correspondence_mode, storage = settings
+        target_states = self.target_states(targets)
+        lod_ratio = playback_lod_ratio(self, data_block, BlendDeformerNode.playback_lod, BlendDeformerNode.lod_ratio)
+        self.fingerprints.use_frame_cache(self, data_block, BlendDeformerNode.frame_cache, BlendDeformerNode.frame_cache_budget)
+
+        # 输入和上一次一致时直接使用上一次的输出
+        input_state = self.fingerprints.input_state(data_block, multi_index)
+        fingerprint = self.geometry_fingerprint(geo_iter, envelope, settings + (lod_ratio,), target_states, input_state)
+        if self.fingerprints.restore(data_block, multi_index, fingerprint, geo_iter):
             return
 
-        target_points = om.MPointArray() # 定义一个接受目标mesh所有点的数组
+        if evaluation_mode != BlendDeformerNode.MODE_PER_VERTEX and np is not None and self.is_mesh_input(data_block, multi_index):
+            closest_point = correspondence_mode == BlendDeformerNode.CORRESPONDENCE_CLOSEST_POINT
+            self.deform_vectorized(data_block, geo_iter, multi_index, targets, envelope, closest_point, storage, input_state, lod_ratio)
+        else:
+            self.deform_per_vertex(data_block, geo_iter, multi_index, targets, envelope)
 
-        target_mesh_fn = om.MFnMesh(target_mesh) # 定义一个目标mesh的函数集
-        target_mesh_fn.getPoints(target_points) # 使用函数集的方法将点放入到点数组中
+        self.fingerprints.store(multi_index, fingerprint, geo_iter)
+
+    def compute(self, plug, data_block):
+        """ parallelGeometry模式下一次计算所有几何体，其余的情况交给MPxDeformerNode逐个调用deform """
+        if plug.attribute() != ommpx.cvar.MPxGeometryFilter_outputGeom or np is None or node_is_disabled(self, data_block) or \
+                data_block.inputValue(BlendDeformerNode.evaluation_mode).asShort() != BlendDeformerNode.MODE_PARALLEL_GEOMETRY:
+            return ommpx.MPxDeformerNode.compute(self, plug, data_block)
+
+        # 所有几何体共用的部分只计算一次: envelope，目标列表(包括打开targetFile)和目标的校验值
+        envelope = data_block.inputValue(self.envelope).asFloat()
+        targets = self.target_list(data_block)
+        settings = self.settings(data_block)
+        _, correspondence_mode, storage = settings
+        closest_point = correspondence_mode == BlendDeformerNode.CORRESPONDENCE_CLOSEST_POINT
+        target_states = self.target_states(targets) if envelope != 0 and targets else ()
+        lod_ratio = playback_lod_ratio(self, data_block, BlendDeformerNode.playback_lod, BlendDeformerNode.lod_ratio)
+        self.fingerprints.use_frame_cache(self, data_block, BlendDeformerNode.frame_cache, BlendDeformerNode.frame_cache_budget)
+
+        def prepare(geo_iter, world_matrix, multi_index):
+            if envelope == 0 or not targets:
+                return None
+
+            input_state = self.fingerprints.input_state(data_block, multi_index)
+            fingerprint = self.geometry_fingerprint(geo_iter, envelope, settings + (lod_ratio,), target_states, input_state)
+            if self.fingerprints.restore(data_block, multi_index, fingerprint, geo_iter):
+                return None
+
+            if not self.is_mesh_input(data_block, multi_index):
+                # 向量化计算的缓存需要mesh，其他几何体(nurbs、lattice)在主线程中逐顶点计算
+                self.deform_per_vertex(data_block, geo_iter, multi_index, targets, envelope)
+                self.fingerprints.store(multi_index, fingerprint, geo_iter)
+                return None
+
+            inputs = self.vectorized_inputs(data_block, geo_iter, multi_index, targets, closest_point, storage, input_state, lod_ratio)
+            cache = inputs[0]
+
+            def job():
+                return self.blend_update(envelope, multi_index, *inputs)
+
+            def finish(result):
+                self.write_positions(geo_iter, multi_index, cache, *result)
+                self.fingerprints.store(multi_index, fingerprint, geo_iter)
+
+            return job, finish
+
+        with self.allocations:
+            parallel_compute(self, data_block, prepare)
+        self.allocations.publish(data_block)
+        data_block.setClean(plug)
+
+    def settings(self, data_block):
+        """ (计算方式, 顶点对应方式, 差值的存储方式) """
+        return (data_block.inputValue(BlendDeformerNode.evaluation_mode).asShort(),
+                data_block.inputValue(BlendDeformerNode.correspondence_mode).asShort(),
+                data_block.inputValue(BlendDeformerNode.delta_storage).asShort())
+
+    def target_states(self, targets):
+        """
+            每个目标的(键, 权重, 校验值)，用于输入指纹
+            目标mesh的校验值需要读取所有的点，只在目标被标记为dirty后重新计算，只有blendWeight改变时不读取目标
+        """
+        states = []
+        for key, target, blend_weight in targets:
+            if isinstance(target, MeshTarget):
+                checksum = self.target_checksums.get(key)
+                if checksum is None:
+                    checksum = target.checksum()
+                    self.target_checksums[key] = checksum
+            else:
+                checksum = target.checksum()  # 文件目标的校验值是文件状态，不需要读取数据
+            states.append((key, blend_weight, checksum))
+        return tuple(states)
+
+    def geometry_fingerprint(self, geo_iter, envelope, settings, target_states, input_state):
+        """
+            一个几何体的输入指纹，input_state是FingerprintCache.input_state的结果
+            有目标无法计算校验值时返回None(不使用指纹)
+        """
+        if any(checksum is None for _, _, checksum in target_states):
+            return None
+        return (envelope, settings, self.fingerprints.weights_generation, target_states, input_state, geo_iter.count())
+
+    def is_mesh_input(self, data_block, multi_index):
+        """ 输入几何体是不是mesh，向量化计算只支持mesh """
+        input_geom = input_geometry(data_block, multi_index)
+        return not input_geom.isNull() and input_geom.hasFn(om.MFn.kMeshData)
 
-        global_weight = blend_weight * envelope  # 得到总的权重值
+    def deform_per_vertex(self, data_block, geo_iter, multi_index, targets, envelope):
+        """ 逐顶点计算的参考实现，用来和向量化的结果进行对比 """
+        # 每个目标的所有点和目标的权重
+        target_point_arrays = [(target.point_array(self.buffers.array(("target", multi_index, key), om.MPointArray)), blend_weight)
+                               for key, target, blend_weight in targets]
 
         geo_iter.reset() # 重置迭代器
         while not geo_iter.isDone():
             
+            source_weight = self.weightValue(data_block, multi_index, geo_iter.index()) # 获取绘制的权重值
+            if source_weight == 0:
+                geo_iter.next() # 权重为0的顶点不移动
+                continue
+
             source_pt = geo_iter.position()
-            target_pt = target_points[geo_iter.index()]
 
-            source_weight = self.weightValue(data_block, multi_index, geo_iter.index()) # 获取绘制的权重值
+            offset = om.MVector()
+            for target_points, blend_weight in target_point_arrays:
+                target_pt = target_points[geo_iter.index()]
+                offset += (target_pt - source_pt) * blend_weight
 
-            final_pt = source_pt + ((target_pt - source_pt) * global_weight * source_weight)
+            final_pt = source_pt + (offset * envelope * source_weight)
 
 
             geo_iter.setPosition(final_pt)
             
             geo_iter.next()    
+
+    def target_list(self, data_block):
+        """
+            获取所有生效的目标，blendMesh和blendWeight是第一个目标，然后是blendTargets数组和targetFile中的目标
+        Returns:
+            list: (键, 目标, 权重)的列表。没有连接mesh或者权重为0的目标会被忽略
+        """
+        targets = []
+
+        blend_weight = data_block.inputValue(BlendDeformerNode.blend_weight).asFloat() # 获取混合的权重值
+        if blend_weight != 0:
+            target_mesh = data_block.inputValue(BlendDeformerNode.blend_mesh).asMesh()  # 获取目标mesh
+            if not target_mesh.isNull():
+                targets.append((BlendDeformerNode.BLEND_MESH_KEY, MeshTarget(target_mesh), blend_weight))
+
+        targets_handle = data_block.inputArrayValue(BlendDeformerNode.blend_targets)
+        for i in range(targets_handle.elementCount()):
+            targets_handle.jumpToArrayElement(i)
+            element_handle = targets_handle.inputValue()
+
+            blend_weight = element_handle.child(BlendDeformerNode.blend_target_weight).asFloat()
+            if blend_weight == 0:
+                continue
+
+            target_mesh = element_handle.child(BlendDeformerNode.blend_target_mesh).asMesh()
+            if not target_mesh.isNull():
+                targets.append((targets_handle.elementIndex(), MeshTarget(target_mesh), blend_weight))
+
+        weights_handle = data_block.inputArrayValue(BlendDeformerNode.file_target_weight)
+        file_weights = []
+        for i in range(weights_handle.elementCount()):
+            weights_handle.jumpToArrayElement(i)
+            blend_weight = weights_handle.inputValue().asFloat()
+            if blend_weight != 0:
+                file_weights.append((weights_handle.elementIndex(), blend_weight))
+
+        if file_weights and np is not None:
+            target_file = self.open_target_file(data_block.inputValue(BlendDeformerNode.target_file).asString())
+            if target_file is not None:
+                file_state, targets_array = target_file
+                for index, blend_weight in file_weights:
+                    if index < len(targets_array):
+                        targets.append(((BlendDeformerNode.FILE_KEY, index), FileTarget(targets_array, index, file_state), blend_weight))
+
+        return targets
+
+    def open_target_file(self, file_path):
+        """
+            使用内存映射打开保存目标的.npy文件，文件没有改变时使用已经打开的映射
+            文件中是(目标数, 顶点数, 3)的数组，保存的是每个目标的顶点位置
+        Returns:
+            (tuple, numpy.memmap): (文件状态, 内存映射的数组)，无法打开时返回None
+        """
+        if not file_path:
+            return None
+
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        file_state = (file_path, stat.st_mtime, stat.st_size)
+
+        if self.target_file is None or self.target_file[0] != file_state:
+            try:
+                targets_array = np.load(file_path, mmap_mode="r")
+            except (IOError, ValueError) as error:
+                om.MGlobal.displayWarning("Failed to load blend targets from {0}: {1}".format(file_path, error))
+                return None
+            if targets_array.ndim != 3 or targets_array.shape[2] != 3:
+                om.MGlobal.displayWarning("Blend target file {0} must contain a (targets, vertices, 3) array".format(file_path))
+                return None
+
+            self.target_file = (file_state, targets_array)
+
+            # 文件改变了，已经缓存的文件目标的差值需要检查
+            for cache in self.geometry_caches.values():
+                cache.unverified_targets.update(key for key in cache.target_deltas if isinstance(key, tuple))
+
+        return self.target_file
+
+    def deform_vectorized(self, data_block, geo_iter, multi_index, targets, envelope, closest_point, storage, input_state, lod_ratio=None):
+        """
+            只累加每个目标有变化的顶点的差值，计算量和有变化的顶点数成正比
+            缓存envelope为1时的完整结果，只有envelope或者blendWeight改变时只需要一次插值
+        Args:
+            data_block (_type_): 数据块
+            geo_iter (_type_): 针对outputgeom的顶点迭代器
+            multi_index (int): geom_index
+            targets (list): (键, 目标, 权重)的列表
+            envelope (float): 总权重
+            closest_point (bool): 是否使用最近点对应
+            storage (int): 差值的存储方式
+            input_state: 输入几何体的状态(FingerprintCache.input_state)，和缓存的不一致时重建缓存
+            lod_ratio (float): 播放时只计算的顶点子集的比例，为None时完整计算
+        """
+        inputs = self.vectorized_inputs(data_block, geo_iter, multi_index, targets, closest_point, storage, input_state, lod_ratio)
+        moved_vertices, new_positions = self.blend_update(envelope, multi_index, *inputs)
+        self.write_positions(geo_iter, multi_index, inputs[0], moved_vertices, new_positions)
+
+    def vectorized_inputs(self, data_block, geo_iter, multi_index, targets, closest_point, storage, input_state, lod_ratio=None):
+        """
+            在主线程中读取向量化计算需要的maya数据
+        Returns:
+            (BlendGeometryCache, list, numpy.ndarray, WeightMap, LodInterpolation):
+                几何体缓存，每个目标的稀疏差值，目标权重，绘制权重，播放时的简化计算(完整计算时为None)
+        """
+        cache = self.geometry_cache(data_block, geo_iter, multi_index, input_state)
+
+        sparse_targets = []
+        target_weights = []
+        for key, target, blend_weight in targets:
+            deltas = cache.sparse_deltas(key, target, closest_point, storage)
+            if deltas is not None:
+                sparse_targets.append(deltas)
+                target_weights.append(blend_weight)
+
+        # 绘制的权重只在weightList改变时重新读取，权重为0的顶点不参与计算
+        weight_map = self.paint_weights.weight_map(data_block, multi_index, cache.vertex_count, cache.indices)
+        lod = cache.playback_lod(lod_ratio) if lod_ratio is not None else None
+        return cache, sparse_targets, np.array(target_weights), weight_map, lod
+
+    def blend_update(self, envelope, multi_index, cache, sparse_targets, target_weights, weight_map, lod=None):
+        """
+            向量化计算中只使用numpy的部分，不调用maya的api，可以在线程池中运行
+        Returns:
+            (numpy.ndarray, numpy.ndarray): 移动了的顶点在迭代器中的位置，这些顶点的新位置
+        """
+        # 只有envelope或者目标权重按比例改变时，直接在原始位置和完整结果之间插值
+        factor = cache.full_factor(sparse_targets, target_weights, weight_map, lod)
+        if factor is None:
+            mask = weight_map.mask if weight_map.is_sparse() else None
+            if lod is not None:
+                mask = lod.subset_mask if mask is None else mask & lod.subset_mask # 播放时只计算子集中的顶点
+
+            # 顶点很多时按顶点范围分块在线程池中计算
+            moved_vertices, full_positions = deformer_executor.default_executor().sparse_blend(
+                cache.positions, sparse_targets, target_weights, weight_map.values, mask)
+            if lod is not None:
+                moved_vertices, full_positions = lod.interpolate(cache.positions, moved_vertices, full_positions,
+                                                                 weight_map.values, weight_map.mask)
+
+            cache.full_result = (sparse_targets, target_weights, weight_map, lod, moved_vertices, cache.positions[moved_vertices], full_positions)
+            factor = 1.0
+
+        _, _, _, _, moved_vertices, rest_positions, new_positions = cache.full_result
+        if factor * envelope != 1:
+            new_positions = deformer_kernels.lerp(rest_positions, new_positions, factor * envelope,
+                                                  self.buffers.numpy_array(("lerp", multi_index), new_positions.shape))
+        return moved_vertices, new_positions
+
+    def write_positions(self, geo_iter, multi_index, cache, moved_vertices, new_positions):
+        """ 在重复使用的numpy数组中复制原始位置，只修改移动了的顶点，整体转换后一次性写回 """
+        positions = self.buffers.numpy_array(("output_positions", multi_index), cache.positions.shape)
+        positions[:] = cache.positions
+        positions[moved_vertices] = new_positions
+        points = self.buffers.array(("output", multi_index), om.MPointArray)
+        geo_iter.setAllPositions(numpy_to_point_array(positions, points))
+
+    def geometry_cache(self, data_block, geo_iter, multi_index, input_state):
+        """
+            获取multi_index对应的几何体缓存，输入的状态(mesh是点位置的校验值)和创建缓存时不一致时重新创建
+            在其他上下文中计算(例如bakePointCache)时不会标记dirty，所以每次都比较输入的状态，不依赖setDependentsDirty
+        """
+        cache = self.geometry_caches.get(multi_index)
+        if cache is None or cache.input_state != input_state or cache.count != geo_iter.count():
+            cache = BlendGeometryCache(geo_iter, input_geometry(data_block, multi_index), input_state,
+                                       self.correspondences.setdefault(multi_index, {}))
+            self.geometry_caches[multi_index] = cache
+        return cache
+
+    def setDependentsDirty(self, plug, plug_array):
+        """ 目标mesh改变时标记对应的缓存需要检查，输入几何体的缓存在每次计算时比较输入的状态 """
+        self.fingerprints.dirty(plug)
+        self.paint_weights.dirty(plug)
+
+        if plug == BlendDeformerNode.blend_mesh:
+            self.dirty_target(BlendDeformerNode.BLEND_MESH_KEY)
+
+        elif plug == BlendDeformerNode.blend_target_mesh or plug == BlendDeformerNode.blend_targets:
+            element_plug = plug.parent() if plug.isChild() else plug
+            if element_plug.isElement():
+                self.dirty_target(element_plug.logicalIndex())
+            else:
+                self.target_checksums.clear()
+                for cache in self.geometry_caches.values():
+                    cache.unverified_targets.update(cache.target_deltas.keys())
+
+        return ommpx.MPxDeformerNode.setDependentsDirty(self, plug, plug_array)
+
+    def storage_report(self):
+        """
+            每个几何体中压缩存储的目标节省的内存和最大还原误差
+        Returns:
+            dict: {multi_index: {目标的键: (节省的字节数, 最大还原误差)}}
+        """
+        return dict((multi_index, dict(cache.storage_reports)) for multi_index, cache in self.geometry_caches.items())
+
+    def dirty_target(self, key):
+        """ 标记所有几何体缓存中这个目标的差值需要检查 """
+        self.target_checksums.pop(key, None)
+        for cache in self.geometry_caches.values():
+            cache.unverified_targets.add(key)
         
     @classmethod
     def creator(cls):
@@ -71,8 +581,79 @@ class BlendDeformerNode(ommpx.MPxDeformerNode):
         numeric_attr.setMin(0.0)
         numeric_attr.setMax(1.0)
 
+        # 额外的目标数组，每个元素有自己的目标mesh和权重
+        cls.blend_target_mesh = typed_attr.create("blendTargetMesh", "btMesh", om.MFnData.kMesh)
+
+        cls.blend_target_weight = numeric_attr.create("blendTargetWeight", "btWeight", om.MFnNumericData.kFloat, 0.0)
+        numeric_attr.setKeyable(True)
+        numeric_attr.setMin(0.0)
+        numeric_attr.setMax(1.0)
+
+        compound_attr = om.MFnCompoundAttribute()
+        cls.blend_targets = compound_attr.create("blendTargets", "bTargets")
+        compound_attr.addChild(cls.blend_target_mesh)
+        compound_attr.addChild(cls.blend_target_weight)
+        compound_attr.setArray(True)
+        compound_attr.setUsesArrayDataBuilder(True)
+
+        # 保存在.npy文件中的目标，每个目标的权重是fileTargetWeight数组中对应序号的元素
+        cls.target_file = typed_attr.create("targetFile", "tFile", om.MFnData.kString)
+        typed_attr.setUsedAsFilename(True)
+
+        cls.file_target_weight = numeric_attr.create("fileTargetWeight", "ftWeight", om.MFnNumericData.kFloat, 0.0)
+        numeric_attr.setKeyable(True)
+        numeric_attr.setMin(0.0)
+        numeric_attr.setMax(1.0)
+        numeric_attr.setArray(True)
+        numeric_attr.setUsesArrayDataBuilder(True)
+
+        cls.playback_lod, cls.lod_ratio = create_lod_attributes()
+
+        enum_attr = om.MFnEnumAttribute()
+        cls.evaluation_mode = enum_attr.create("evaluationMode", "evalMode", cls.MODE_VECTORIZED)
+        enum_attr.addField("perVertex", cls.MODE_PER_VERTEX)
+        enum_attr.addField("vectorized", cls.MODE_VECTORIZED)
+        enum_attr.addField("parallelGeometry", cls.MODE_PARALLEL_GEOMETRY)
+        enum_attr.setKeyable(False)
+        enum_attr.setChannelBox(True)
+
+        cls.correspondence_mode = enum_attr.create("correspondenceMode", "corMode", cls.CORRESPONDENCE_VERTEX_INDEX)
+        enum_attr.addField("vertexIndex", cls.CORRESPONDENCE_VERTEX_INDEX)
+        enum_attr.addField("closestPoint", cls.CORRESPONDENCE_CLOSEST_POINT)
+        enum_attr.setKeyable(False)
+        enum_attr.setChannelBox(True)
+
+        # 0, 1, 2和deformer_kernels.DELTA_STORAGE_*一致
+        cls.delta_storage = enum_attr.create("deltaStorage", "dStorage", 0)
+        enum_attr.addField("float64", 0)
+        enum_attr.addField("float16", 1)
+        enum_attr.addField("int16", 2)
+        enum_attr.setKeyable(False)
+        enum_attr.setChannelBox(True)
+
         cls.addAttribute(cls.blend_mesh)
         cls.addAttribute(cls.blend_weight)
+        cls.addAttribute(cls.blend_targets)
+        cls.addAttribute(cls.target_file)
+        cls.addAttribute(cls.file_target_weight)
+        cls.addAttribute(cls.evaluation_mode)
+        cls.addAttribute(cls.correspondence_mode)
+        cls.addAttribute(cls.delta_storage)
+        cls.addAttribute(cls.playback_lod)
+        cls.addAttribute(cls.lod_ratio)
+
+        # 按帧缓存输出，不影响计算结果，所以不需要attributeAffects
+        cls.frame_cache, cls.frame_cache_budget = create_frame_cache_attributes()
+        cls.addAttribute(cls.frame_cache)
+        cls.addAttribute(cls.frame_cache_budget)
+
+        cls.fingerprint_hits, cls.fingerprint_misses = create_fingerprint_attributes()
+        cls.addAttribute(cls.fingerprint_hits)
+        cls.addAttribute(cls.fingerprint_misses)
+
+        cls.allocation_blocks, cls.allocation_peak_bytes = create_allocation_attributes()
+        cls.addAttribute(cls.allocation_blocks)
+        cls.addAttribute(cls.allocation_peak_bytes)
 
         #变形器节点具有默认的outputGeom属性，因此我们没必要再创建一个输出的属性，我们可以直接利用这个默认的outputGemo属性
         #outputGeom是我们需要变形的geom
@@ -80,6 +661,34 @@ class BlendDeformerNode(ommpx.MPxDeformerNode):
 
         cls.attributeAffects(cls.blend_mesh, output_geom)
         cls.attributeAffects(cls.blend_weight,output_geom)
+        cls.attributeAffects(cls.blend_targets, output_geom)
+        cls.attributeAffects(cls.blend_target_mesh, output_geom)
+        cls.attributeAffects(cls.blend_target_weight, output_geom)
+        cls.attributeAffects(cls.target_file, output_geom)
+        cls.attributeAffects(cls.file_target_weight, output_geom)
+        cls.attributeAffects(cls.evaluation_mode, output_geom)
+        cls.attributeAffects(cls.correspondence_mode, output_geom)
+        cls.attributeAffects(cls.delta_storage, output_geom)
+        cls.attributeAffects(cls.playback_lod, output_geom)
+        cls.attributeAffects(cls.lod_ratio, output_geom)
+
+def save_blend_targets(file_path, mesh_names):
+    """
+        把多个mesh的顶点位置保存为targetFile使用的.npy文件(float32, 形状为(目标数, 顶点数, 3))
+        所有mesh的顶点数必须相同
+    """
+    targets = []
+    for mesh_name in mesh_names:
+        selection_list = om.MSelectionList()
+        selection_list.add(mesh_name)
+        dag_path = om.MDagPath()
+        selection_list.getDagPath(0, dag_path)
+
+        points = om.MPointArray()
+        om.MFnMesh(dag_path).getPoints(points)
+        targets.append(point_array_to_numpy(points))
+
+    np.save(file_path, np.array(targets, dtype=np.float32))
 
 def initializePlugin(plugin):
     """ 插件加载时执行这个函数"""
@@ -98,10 +707,12 @@ def initializePlugin(plugin):
         om.MGlobal.displayError("Failed to register node: {0}".format(BlendDeformerNode.TYPE_NAME))
     
     cmds.makePaintable(BlendDeformerNode.TYPE_NAME, "weights", attrType="multiFloat", shapeMode = "deformer") # 使其能绘制权重
+    register_playback_callback() # 播放停止时恢复完整的计算
 
 def uninitializePlugin(plugin):
     """ 插件取消加载时执行这个函数"""
     cmds.makePaintable(BlendDeformerNode.TYPE_NAME, "weights",remove=True) # 移除使其能绘制权重
+    deregister_playback_callback()
     plugin_fn = ommpx.MFnPlugin(plugin)
     try:
         plugin_fn.deregisterNode(BlendDeformerNode.TYPE_ID)
@@ -0,0 +1,112 @@
+# coding: utf-8
+# 查询变形器按帧缓存(frameCache)的命中率和占用的内存
+import maya.api.OpenMaya as om
+import maya.cmds as cmds
+
+from deformer_utils import frame_caches
+
+
+def maya_useNewAPI():
+    """ 告知maya,使用的是maya api 2.0 """
+    pass
+
+
+class DeformerFrameCacheCmd(om.MPxCommand):
+    """
+        deformerFrameCache                          # 打印每个节点的统计，返回节点名的列表
+        deformerFrameCache -hitRate attractordeformernode1  # 返回命中率，不指定节点时是所有节点合计
+        deformerFrameCache -residentSize            # 返回占用的字节数
+        deformerFrameCache -clear                   # 释放缓存的结果
+    """
+    COMMAND_NAME = "deformerFrameCache"
+    # 定义命令的标志
+    HIT_RATE_FLAG = ["-hr", "-hitRate"]
+    RESIDENT_SIZE_FLAG = ["-rs", "-residentSize"]
+    CLEAR_FLAG = ["-cl", "-clear"]
+
+    def __init__(self):
+        super(DeformerFrameCacheCmd, self).__init__()
+
+    def doIt(self, arg_list):
+        try:
+            arg_db = om.MArgDatabase(self.syntax(), arg_list) # 创建对象解析语法与参数
+        except:
+            self.displayError("Error parsing arguments")
+            raise
+
+        node_names = arg_db.getObjectStrings()
+        caches = [(name, frame_cache) for name, frame_cache in frame_caches() if not node_names or name in node_names]
+
+        if arg_db.isFlagSet(DeformerFrameCacheCmd.CLEAR_FLAG[0]):
+            for _, frame_cache in caches:
+                frame_cache.clear()
+
+        elif arg_db.isFlagSet(DeformerFrameCacheCmd.HIT_RATE_FLAG[0]):
+            hits = sum(frame_cache.hits for _, frame_cache in caches)
+            total = hits + sum(frame_cache.misses for _, frame_cache in caches)
+            self.setResult(hits / float(total) if total else 0.0)
+
+        elif arg_db.isFlagSet(DeformerFrameCacheCmd.RESIDENT_SIZE_FLAG[0]):
+            self.setResult(sum(frame_cache.resident for _, frame_cache in caches))
+
+        else:
+            for name, frame_cache in caches:
+                stats = frame_cache.stats()
+                om.MGlobal.displayInfo("{0}: hit rate {1:.1%} ({2} hits, {3} misses), {4} frames, {5:.1f} / {6:.1f} MB, {7} evictions".format(
+                    name, stats["hit_rate"], stats["hits"], stats["misses"], stats["entries"],
+                    stats["resident_bytes"] / 1048576.0, stats["budget_bytes"] / 1048576.0, stats["evictions"]))
+            self.setResult([name for name, _ in caches])
+
+    @classmethod
+    def creator(cls):
+        """ 注册maya命令时使用的方法，用来得到类的实例 """
+        return DeformerFrameCacheCmd()
+
+    @classmethod
+    def create_syntax(cls):
+
+        syntax = om.MSyntax()
+
+        syntax.addFlag(*cls.HIT_RATE_FLAG)
+        syntax.addFlag(*cls.RESIDENT_SIZE_FLAG)
+        syntax.addFlag(*cls.CLEAR_FLAG)
+
+        # 可以指定节点名，不指定时是所有开启了frameCache的节点
+        syntax.setObjectType(om.MSyntax.kStringObjects, 0)
+
+        return syntax
+
+
+def initializePlugin(plugin):
+    """ 插件加载时执行这个函数"""
+    vendor = "RuiChen"  # 插件制作人的名字
+    version = "1.0.0"  # 插件的版本
+
+    plugin_fn = om.MFnPlugin(plugin, vendor, version)  # 定义插件
+
+    try:
+        plugin_fn.registerCommand(DeformerFrameCacheCmd.COMMAND_NAME, DeformerFrameCacheCmd.creator, DeformerFrameCacheCmd.create_syntax)
+    except:
+        om.MGlobal.displayError("Failed to register command: {0}".format(DeformerFrameCacheCmd.COMMAND_NAME))  # 注册失败时输出
+
+
+def uninitializePlugin(plugin):
+    """ 插件取消加载时执行这个函数 """
+    plugin_fn = om.MFnPlugin(plugin)
+    try:
+        plugin_fn.deregisterCommand(DeformerFrameCacheCmd.COMMAND_NAME)  # 取消注册新命令
+    except:
+        om.MGlobal.displayError("Failed to deregister command: {0}".format(DeformerFrameCacheCmd.COMMAND_NAME))  # 取消注册失败时输出
+
+
+if __name__ == '__main__':
+    plugin_name = "deformer_cache_cmd.py"  # 插件的文件名
+    # 如果插件加载了就先取消加载插件
+    cmds.evalDeferred(
+        'if cmds.pluginInfo("{0}", q=True, loaded=True): cmds.unloadPlugin("{0}")'.format(plugin_name))
+    # 如果插件没有加载就加载插件
+    cmds.evalDeferred(
+        'if not cmds.pluginInfo("{0}", q=True, loaded=True): cmds.loadPlugin("{0}")'.format(plugin_name))
+
+    cmds.evalDeferred('cmds.setAttr("attractordeformernode1.frameCache", True)')
+    cmds.evalDeferred('print(cmds.deformerFrameCache(hitRate=True), cmds.deformerFrameCache(residentSize=True))')
@@ -0,0 +1,153 @@
+# coding: utf-8
+# 把一个大模型的顶点分成多块，在线程池中同时运行deformer_kernels的计算核心，不依赖maya
+# numpy在计算大数组时会释放GIL，所以一个模型的计算也可以使用多个cpu核
+import multiprocessing
+import threading
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+import deformer_kernels
+
+
+class ChunkedExecutor(object):
+    """
+        按顶点序号把[0, n)分成chunk_size大小的块，每块交给线程池中的一个线程计算
+        所有块的结果写入同一个预先分配的输出数组，顶点数不超过chunk_size时直接在当前线程中计算
+    """
+
+    CHUNK_SIZE = 65536  # 每块的顶点数，太小时线程调度的开销会超过计算
+
+    def __init__(self, chunk_size=CHUNK_SIZE, workers=None):
+        """
+        Args:
+            chunk_size (int): 每块的顶点数
+            workers (int): 线程数，为None时和cpu核数一致
+        """
+        self.chunk_size = max(int(chunk_size), 1)
+        self.workers = max(int(workers or multiprocessing.cpu_count()), 1)
+        self.pool = None
+        self.pool_lock = threading.Lock()  # 多个节点可能同时在不同线程中第一次使用线程池
+
+    def close(self):
+        """ 关闭线程池 """
+        with self.pool_lock:
+            pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    def thread_pool(self):
+        """ 返回线程池，第一次使用时创建 """
+        with self.pool_lock:
+            if self.pool is None:
+                self.pool = ThreadPool(self.workers)
+            return self.pool
+
+    def chunks(self, count):
+        """ 把[0, count)分成的(start, stop)列表 """
+        return [(start, min(start + self.chunk_size, count)) for start in range(0, count, self.chunk_size)]
+
+    def run(self, func, count):
+        """
+            对每一块调用func(start, stop)，返回每一块的结果(按块的顺序)
+            只有一块或者只有一个线程时不使用线程池
+        """
+        chunks = self.chunks(count)
+        if len(chunks) <= 1 or self.workers == 1:
+            return [func(start, stop) for start, stop in chunks]
+
+        return self.thread_pool().map(lambda chunk: func(*chunk), chunks)
+
+    def basic_deform(self, points, indices, matrix, out=None):
+        """ 分块计算deformer_kernels.basic_deform，结果写入out """
+        out = np.empty_like(points) if out is None else out
+
+        def chunk(start, stop):
+            out[start:stop] = deformer_kernels.basic_deform(points[start:stop], indices[start:stop], matrix)
+
+        self.run(chunk, len(points))
+        return out
+
+    def blend_deform(self, source, target, weights, global_weight, out=None):
+        """ 分块计算deformer_kernels.blend_deform，结果写入out """
+        out = np.empty_like(source) if out is None else out
+
+        def chunk(start, stop):
+            out[start:stop] = deformer_kernels.blend_deform(source[start:stop], target[start:stop], weights[start:stop], global_weight)
+
+        self.run(chunk, len(source))
+        return out
+
+    def sparse_blend(self, points, sparse_targets, target_weights, weights, mask=None):
+        """
+            分块计算deformer_kernels.sparse_blend，每个目标的稀疏序号是升序的，按顶点范围二分查找切分
+            每块移动了的顶点互不重叠，按块的顺序拼接后仍然是升序的
+        """
+        if mask is not None:
+            sparse_targets = [deformer_kernels.restrict_sparse(sparse_target, mask) for sparse_target in sparse_targets]
+
+        def chunk(start, stop):
+            chunk_targets = []
+            for indices, data, scale in sparse_targets:
+                lo, hi = np.searchsorted(indices, (start, stop))
+                chunk_targets.append((indices[lo:hi], data[lo:hi], scale))
+            return deformer_kernels.sparse_blend(points, chunk_targets, target_weights, weights)
+
+        return concatenate_results(self.run(chunk, len(points)))
+
+    def attractor_pairs(self, points, normals, targets, max_distances, candidates, owners, weights=None):
+        """
+            分块计算deformer_kernels.attractor_pairs，候选组合按顶点序号排序后按顶点范围切分
+            同一个顶点的所有组合在同一块中，偏移的累加结果和不分块时一致
+        """
+        order = np.argsort(candidates, kind="stable")
+        candidates = candidates[order]
+        owners = owners[order]
+
+        def chunk(start, stop):
+            lo, hi = np.searchsorted(candidates, (start, stop))
+            return deformer_kernels.attractor_pairs(points, normals, targets, max_distances,
+                                                    candidates[lo:hi], owners[lo:hi], weights)
+
+        return concatenate_results(self.run(chunk, len(points)))
+
+    def attractor_deform(self, points, normals, grid, targets, max_distances, weights=None, out=None):
+        """ 使用空间索引找出候选组合，分块计算后把所有顶点的新位置写入out """
+        out = np.empty_like(points) if out is None else out
+        out[:] = points
+
+        candidates, owners = deformer_kernels.attractor_candidates(grid, targets, max_distances)
+        moved_vertices, new_positions = self.attractor_pairs(points, normals, targets, max_distances, candidates, owners, weights)
+        out[moved_vertices] = new_positions
+        return out
+
+
+def concatenate_results(results):
+    """ 把每块的(移动了的顶点, 新位置)按顺序拼接 """
+    if not results:
+        return np.empty(0, dtype=np.intp), np.empty((0, 3))
+    return np.concatenate([moved for moved, _ in results]), np.concatenate([positions for _, positions in results])
+
+
+_default_executor = None  # 节点共用的执行器
+_default_executor_lock = threading.Lock()
+
+
+def default_executor():
+    """ 返回节点共用的执行器，第一次使用时按默认参数创建 """
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = ChunkedExecutor()
+        return _default_executor
+
+
+def configure(chunk_size=ChunkedExecutor.CHUNK_SIZE, workers=None):
+    """ 修改节点共用的执行器的块大小和线程数，workers为1时所有计算都在当前线程中进行 """
+    global _default_executor
+    with _default_executor_lock:
+        previous, _default_executor = _default_executor, ChunkedExecutor(chunk_size, workers)
+    if previous is not None:
+        previous.close()
+    return _default_executor
@@ -0,0 +1,216 @@
+# coding: utf-8
+# 变形器的计算核心，只依赖numpy，不依赖maya，可以在普通的python环境中运行和测试
+# 所有的点、法线都是(n, 3)的float64数组，矩阵是maya约定的(4, 4)行向量矩阵
+import numpy as np
+
+ATTRACTOR_MAX_ANGLE = 0.5 * 3.14159265 # 90度
+
+# 稀疏差值的存储方式
+DELTA_STORAGE_FLOAT64 = 0  # 不压缩
+DELTA_STORAGE_FLOAT16 = 1  # 半精度浮点数
+DELTA_STORAGE_INT16 = 2  # 16位整数加上每个目标的缩放值
+
+
+def attractor_candidates(grid, targets, max_distances):
+    """
+        找出每个目标点最大距离范围内的顶点
+    Args:
+        grid (UniformGrid): 顶点原始位置的空间索引
+        targets (numpy.ndarray): (k, 3)的目标位置
+        max_distances (numpy.ndarray): (k,)的每个目标点的最大距离
+    Returns:
+        (numpy.ndarray, numpy.ndarray): 候选顶点的序号，每个候选顶点对应的目标点序号
+    """
+    candidate_list = [grid.query_sphere(target, max_distance) for target, max_distance in zip(targets, max_distances)]
+    candidates = np.concatenate(candidate_list) if candidate_list else np.empty(0, dtype=np.intp)
+    owners = np.repeat(np.arange(len(candidate_list)), [len(c) for c in candidate_list])
+    return candidates, owners
+
+
+def attractor_pairs(points, normals, targets, max_distances, candidates, owners, weights=None):
+    """
+        计算(顶点, 目标点)组合的吸引偏移，一个顶点在多个目标点范围内时偏移会累加
+    Args:
+        points (numpy.ndarray): (n, 3)的顶点原始位置
+        normals (numpy.ndarray): (n, 3)的顶点法线
+        targets (numpy.ndarray): (k, 3)的目标位置
+        max_distances (numpy.ndarray): (k,)的每个目标点的最大距离
+        candidates (numpy.ndarray): 候选顶点的序号
+        owners (numpy.ndarray): 每个候选顶点对应的目标点序号
+        weights (numpy.ndarray): (n,)的绘制权重，为None时所有顶点的权重为1
+    Returns:
+        (numpy.ndarray, numpy.ndarray): 移动了的顶点的序号(升序)，这些顶点的新位置
+    """
+    positions = points[candidates]
+    normal_array = normals[candidates]
+    pair_max_distances = max_distances[owners]
+
+    target_vectors = targets[owners] - positions
+    distances = np.sqrt(np.einsum("ij,ij->i", target_vectors, target_vectors))
+
+    # 与MVector.angle一样通过反余弦得到法线与目标向量的夹角
+    lengths = np.sqrt(np.einsum("ij,ij->i", normal_array, normal_array)) * distances
+    dots = np.einsum("ij,ij->i", normal_array, target_vectors)
+    cosines = np.ones_like(dots)
+    np.divide(dots, lengths, out=cosines, where=lengths > 0)
+    angles = np.arccos(np.clip(cosines, -1.0, 1.0))
+
+    moved = np.flatnonzero((distances <= pair_max_distances) & (angles <= ATTRACTOR_MAX_ANGLE))
+
+    falloff = (pair_max_distances[moved] - distances[moved]) / pair_max_distances[moved]
+    if weights is not None:
+        falloff *= weights[candidates[moved]]
+    offsets = target_vectors[moved] * falloff[:, np.newaxis]
+
+    # 一个顶点可能在多个目标点的范围内，把偏移累加到同一个顶点上
+    moved_vertices, inverse = np.unique(candidates[moved], return_inverse=True)
+    total_offsets = np.zeros((len(moved_vertices), 3))
+    np.add.at(total_offsets, inverse.ravel(), offsets)
+
+    return moved_vertices, points[moved_vertices] + total_offsets
+
+
+def attractor_deform(points, normals, targets, max_distances):
+    """ 不使用空间索引，检查所有的(顶点, 目标点)组合，返回所有顶点的新位置 """
+    targets = np.asarray(targets, dtype=np.float64).reshape(-1, 3)
+    max_distances = np.asarray(max_distances, dtype=np.float64).reshape(-1)
+
+    candidates = np.tile(np.arange(len(points)), len(targets))
+    owners = np.repeat(np.arange(len(targets)), len(points))
+
+    result = np.array(points, dtype=np.float64)
+    moved_vertices, new_positions = attractor_pairs(points, normals, targets, max_distances, candidates, owners)
+    result[moved_vertices] = new_positions
+    return result
+
+
+def blend_deform(source, target, weights, global_weight):
+    """
+        source + (target - source) * global_weight * weights
+    Args:
+        source (numpy.ndarray): (n, 3)的原始位置
+        target (numpy.ndarray): (n, 3)的目标位置
+        weights (numpy.ndarray): (n,)的绘制权重
+        global_weight (float): envelope * blendWeight
+    """
+    return source + (target - source) * (global_weight * weights)[:, np.newaxis]
+
+
+def lerp(rest, full, factor, out=None):
+    """
+        在原始位置和完整强度(envelope为1)的结果之间线性插值
+        只有envelope或者blendWeight改变时，用它代替重新计算整个变形
+        out是用来保存结果的数组，可以在多次计算之间重复使用
+    """
+    out = np.subtract(full, rest, out=out)
+    out *= factor
+    out += rest
+    return out
+
+
+def sparse_deltas(source, target, tolerance=0.0):
+    """
+        计算目标相对于原始位置的差值，只保留有变化的点
+    Returns:
+        (numpy.ndarray, numpy.ndarray): 有变化的点的序号，(m, 3)的差值
+    """
+    deltas = np.asarray(target, dtype=np.float64) - source
+    changed = np.flatnonzero(np.abs(deltas).max(axis=1) > tolerance) if len(deltas) else np.empty(0, dtype=np.intp)
+    return changed, deltas[changed]
+
+
+def quantize_deltas(deltas, storage):
+    """
+        按照存储方式压缩差值
+    Args:
+        deltas (numpy.ndarray): (m, 3)的float64差值
+        storage (int): DELTA_STORAGE_*
+    Returns:
+        (numpy.ndarray, float): 压缩后的数据，还原时乘以的缩放值
+    """
+    if storage == DELTA_STORAGE_FLOAT16:
+        return deltas.astype(np.float16), 1.0
+
+    if storage == DELTA_STORAGE_INT16:
+        max_abs = float(np.abs(deltas).max()) if deltas.size else 0.0
+        scale = max_abs / 32767.0 if max_abs > 0 else 1.0
+        return np.round(deltas / scale).astype(np.int16), scale
+
+    return deltas, 1.0
+
+
+def dequantize_deltas(data, scale):
+    """ 还原压缩后的差值 """
+    return np.multiply(data, scale, dtype=np.float64)
+
+
+def quantization_error(deltas, data, scale):
+    """
+        压缩节省的内存和最大还原误差
+    Returns:
+        (int, float): 和float64相比节省的字节数，每个分量的最大绝对误差
+    """
+    error = float(np.abs(dequantize_deltas(data, scale) - deltas).max()) if deltas.size else 0.0
+    return deltas.nbytes - data.nbytes, error
+
+
+def sparse_blend(points, sparse_targets, target_weights, weights, mask=None):
+    """
+        把多个目标的稀疏差值按目标权重累加到原始位置上，只计算有变化的点
+        差值可以是压缩过的数据，在乘以权重时还原为float64
+    Args:
+        points (numpy.ndarray): (n, 3)的原始位置
+        sparse_targets (list): 每个目标的(序号, 差值数据, 缩放值)
+        target_weights (list): 每个目标的权重
+        weights (numpy.ndarray): (n,)的每个点的权重(绘制权重 * envelope)
+        mask (numpy.ndarray): (n,)的bool数组，只计算为True(权重不为0)的点，为None时计算所有有变化的点
+    Returns:
+        (numpy.ndarray, numpy.ndarray): 移动了的点的序号(升序)，这些点的新位置
+    """
+    if mask is not None:
+        sparse_targets = [restrict_sparse(sparse_target, mask) for sparse_target in sparse_targets]
+
+    if not sparse_targets:
+        return np.empty(0, dtype=np.intp), np.empty((0, 3))
+
+    if len(sparse_targets) == 1:
+        # 只有一个目标时每个点只出现一次，直接缩放相加
+        moved, data, scale = sparse_targets[0]
+        return moved, points[moved] + np.multiply(data, target_weights[0] * scale, dtype=np.float64) * weights[moved][:, np.newaxis]
+
+    indices = np.concatenate([target_indices for target_indices, _, _ in sparse_targets])
+    scaled_deltas = np.concatenate([np.multiply(data, weight * scale, dtype=np.float64)
+                                    for (_, data, scale), weight in zip(sparse_targets, target_weights)])
+
+    moved, inverse = np.unique(indices, return_inverse=True)
+    total_deltas = np.zeros((len(moved), 3))
+    np.add.at(total_deltas, inverse.ravel(), scaled_deltas)
+
+    return moved, points[moved] + total_deltas * weights[moved][:, np.newaxis]
+
+
+def restrict_sparse(sparse_target, mask):
+    """ 只保留稀疏差值中mask为True的点 """
+    indices, data, scale = sparse_target
+    keep = mask[indices]
+    return indices[keep], data[keep], scale
+
+
+def basic_deform(points, indices, matrix):
+    """
+        序号为偶数的顶点乘以矩阵，其余的顶点不变
+    Args:
+        points (numpy.ndarray): (n, 3)的顶点位置
+        indices (numpy.ndarray): (n,)的每个点的顶点序号
+        matrix (numpy.ndarray): (4, 4)的矩阵
+    """
+    result = np.array(points, dtype=np.float64)
+    even = indices % 2 == 0
+    result[even] = transform_points(points[even], matrix)
+    return result
+
+
+def transform_points(points, matrix):
+    """ 点乘以矩阵(行向量，和MPoint * MMatrix一致) """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    return np.dot(points, matrix[:3, :3]) + matrix[3, :3]
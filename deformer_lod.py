@@ -0,0 +1,146 @@
+# coding: utf-8
+# 播放时使用的简化计算(level of detail)，不依赖maya
+# 只计算一部分顶点(子集)，其余顶点的位移由附近子集顶点的位移插值得到
+import numpy as np
+
+from spatial_grid import UniformGrid
+
+
+class LodInterpolation(object):
+    """
+        顶点子集和稀疏插值矩阵
+        子集是每个网格单元中的第一个顶点，网格单元的大小使子集的顶点数约为ratio * n
+        插值矩阵按ELL格式保存: 每个顶点固定有NEIGHBOURS个(子集中的序号, 权重)，不足的用权重0补齐
+    """
+
+    NEIGHBOURS = 4  # 每个顶点从几个子集顶点插值
+    CHUNK_SIZE = 65536  # 创建插值矩阵时每次处理的顶点数，限制(顶点数, 8)的候选数组的内存
+
+    def __init__(self, points, ratio, neighbours=NEIGHBOURS):
+        """
+        Args:
+            points (numpy.ndarray): (n, 3)的顶点原始位置
+            ratio (float): 子集的顶点数占所有顶点的比例(大约)
+            neighbours (int): 每个顶点从几个子集顶点插值
+        """
+        self.ratio = ratio
+        points = np.ascontiguousarray(points, dtype=np.float64).reshape(-1, 3)
+        ratio = min(max(float(ratio), 1e-4), 1.0)
+
+        self.grid = UniformGrid(points, points_per_cell=1.0 / ratio)
+
+        # 每个非空网格单元中的第一个顶点作为子集
+        keys = self.grid.sorted_keys
+        heads = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]])) if len(keys) else np.empty(0, dtype=np.intp)
+        self.cell_keys = keys[heads]  # 升序，和subset_by_cell一一对应
+        self.subset_by_cell = self.grid.order[heads]
+        self.subset = np.sort(self.subset_by_cell)
+
+        self.subset_mask = np.zeros(len(points), dtype=bool)
+        self.subset_mask[self.subset] = True
+        self.subset_position = np.full(len(points), -1, dtype=np.int32)  # 顶点在子集中的位置，不在子集中为-1
+        self.subset_position[self.subset] = np.arange(len(self.subset), dtype=np.int32)
+
+        self.neighbour_indices = np.zeros((len(points), neighbours), dtype=np.int32)  # 子集中的位置
+        self.neighbour_weights = np.zeros((len(points), neighbours))
+        for start in range(0, len(points), LodInterpolation.CHUNK_SIZE):
+            self.build_rows(points, start, min(start + LodInterpolation.CHUNK_SIZE, len(points)))
+
+    def build_rows(self, points, start, stop):
+        """
+            在顶点所在的单元和靠近的一侧的相邻单元(共2x2x2个)的子集顶点中找出最近的几个，按距离的倒数计算权重
+        """
+        queries = points[start:stop]
+        coords = self.grid.cell_coords(queries)
+
+        # 顶点在单元中靠近哪一侧，就检查那一侧的相邻单元
+        sides = np.where((queries - self.grid.bounds_min) / self.grid.cell_size - coords >= 0.5, 1, -1)
+        offsets = np.stack(np.meshgrid([0, 1], [0, 1], [0, 1], indexing="ij"), axis=-1).reshape(-1, 3)
+        neighbour_coords = coords[:, np.newaxis, :] + offsets[np.newaxis, :, :] * sides[:, np.newaxis, :]
+        valid = np.all((neighbour_coords >= 0) & (neighbour_coords < self.grid.dims), axis=2)
+        keys = self.grid.cell_key(neighbour_coords)
+
+        positions = np.clip(np.searchsorted(self.cell_keys, keys), 0, max(len(self.cell_keys) - 1, 0))
+        found = valid & (self.cell_keys[positions] == keys) if len(self.cell_keys) else np.zeros_like(valid)
+        candidates = np.where(found, self.subset_by_cell[positions] if len(self.cell_keys) else 0, 0)
+
+        offsets = points[candidates] - queries[:, np.newaxis, :]
+        distances = np.where(found, np.sqrt(np.einsum("ijk,ijk->ij", offsets, offsets)), np.inf)
+
+        # 每行取距离最小的neighbours个候选
+        neighbours = self.neighbour_indices.shape[1]
+        if distances.shape[1] > neighbours:
+            nearest = np.argpartition(distances, neighbours - 1, axis=1)[:, :neighbours]
+        else:
+            nearest = np.argsort(distances, axis=1)
+        rows = np.arange(len(queries))[:, np.newaxis]
+        nearest_distances = distances[rows, nearest]
+        nearest_vertices = candidates[rows, nearest]
+
+        weights = np.where(np.isfinite(nearest_distances), 1.0 / (nearest_distances + 1e-12), 0.0)
+        totals = weights.sum(axis=1)
+
+        # 周围没有子集顶点时(很稀疏的区域)使用整个子集中最近的一个顶点
+        missing = np.flatnonzero(totals == 0)
+        if missing.size and len(self.subset):
+            subset_grid = UniformGrid(points[self.subset], points_per_cell=2)
+            nearest_subset, _ = subset_grid.nearest(queries[missing])
+            nearest_vertices[missing] = 0
+            nearest_vertices[missing, 0] = self.subset[nearest_subset]
+            weights[missing] = 0.0
+            weights[missing, 0] = 1.0
+            totals[missing] = 1.0
+
+        self.neighbour_indices[start:stop] = np.where(weights > 0, self.subset_position[nearest_vertices], 0)
+        self.neighbour_weights[start:stop] = weights / np.where(totals > 0, totals, 1.0)[:, np.newaxis]
+
+        # 子集中的顶点直接使用自己的结果
+        in_subset = np.flatnonzero(self.subset_mask[start:stop])
+        self.neighbour_indices[start + in_subset] = 0
+        self.neighbour_indices[start + in_subset, 0] = self.subset_position[start + in_subset]
+        self.neighbour_weights[start + in_subset] = 0.0
+        self.neighbour_weights[start + in_subset, 0] = 1.0
+
+    def interpolate(self, rest, moved_vertices, new_positions, weights=None, mask=None):
+        """
+            把子集顶点的计算结果插值到所有顶点，只计算附近有子集顶点移动了的顶点
+            有绘制权重时，子集顶点的位移先除以它自己的权重，插值后再乘以每个顶点自己的权重，权重为0的顶点不移动
+            权重为0的子集顶点没有计算过，不参与插值，插值权重在其余的子集顶点中重新归一化
+        Args:
+            rest (numpy.ndarray): (n, 3)的原始位置
+            moved_vertices (numpy.ndarray): 移动了的子集顶点的序号
+            new_positions (numpy.ndarray): 这些顶点的新位置(已经乘以了绘制权重)
+            weights (numpy.ndarray): (n,)的绘制权重，为None时所有顶点的权重为1
+            mask (numpy.ndarray): (n,)的权重不为0的顶点，为None时由weights得到
+        Returns:
+            (numpy.ndarray, numpy.ndarray): 移动了的顶点的序号(升序)，这些顶点的新位置
+        """
+        displacements = np.zeros((len(self.subset), 3))
+        subset_moved = np.zeros(len(self.subset), dtype=bool)
+        positions = self.subset_position[moved_vertices]
+        displacements[positions] = new_positions - rest[moved_vertices]
+        subset_moved[positions] = True
+        if weights is not None:
+            subset_weights = weights[moved_vertices]
+            displacements[positions] /= np.where(subset_weights != 0, subset_weights, 1.0)[:, np.newaxis]
+
+        if mask is None and weights is not None:
+            mask = weights != 0
+
+        affected = (subset_moved[self.neighbour_indices] & (self.neighbour_weights > 0)).any(axis=1)
+        if mask is not None:
+            affected &= mask
+        affected = np.flatnonzero(affected)
+
+        neighbour_indices = self.neighbour_indices[affected]
+        neighbour_weights = self.neighbour_weights[affected]
+        if mask is not None:
+            # 只使用计算过的(权重不为0的)子集顶点，重新归一化
+            neighbour_weights = np.where(mask[self.subset][neighbour_indices], neighbour_weights, 0.0)
+            totals = neighbour_weights.sum(axis=1)
+            neighbour_weights /= np.where(totals > 0, totals, 1.0)[:, np.newaxis]
+
+        offsets = np.einsum("ik,ikj->ij", neighbour_weights, displacements[neighbour_indices])
+        if weights is not None:
+            offsets *= weights[affected][:, np.newaxis]
+        return affected, rest[affected] + offsets
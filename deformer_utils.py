@@ -0,0 +1,753 @@
+# coding: utf-8
+# 变形器节点共用的工具函数，负责maya的数组和numpy数组之间的转换
+import collections
+import ctypes
+import functools
+import multiprocessing
+import threading
+import zlib
+from multiprocessing.pool import ThreadPool
+
+import maya.OpenMaya as om
+import maya.OpenMayaMPx as ommpx
+import maya.cmds as cmds
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # maya自带的python不一定安装了numpy，没有numpy时节点会使用逐顶点的计算方式
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None  # python2没有tracemalloc，无法统计内存分配
+
+
+def script_util_buffer(length):
+    """
+        创建长度为length的MScriptUtil数组(初始值为0)
+        MScriptUtil必须在使用它的指针的期间一直存在
+    """
+    util = om.MScriptUtil()
+    util.createFromList([0.0] * length, length)
+    return util
+
+def buffer_view(pointer, ctype, length):
+    """ 指针指向的length个元素的numpy视图，不复制数据 """
+    return np.ctypeslib.as_array((ctype * length).from_address(int(pointer)))
+
+def point_array_to_numpy(point_array):
+    """
+        将MPointArray转换为(n, 3)的numpy数组
+        通过MPointArray.get一次复制到MScriptUtil的double[n][4]数组，不逐个创建MPoint
+    """
+    count = point_array.length()
+    if not count:
+        return np.empty((0, 3), dtype=np.float64)
+    try:
+        util = script_util_buffer(count * 4)
+        pointer = util.asDouble4Ptr()
+        point_array.get(pointer)
+        return buffer_view(pointer, ctypes.c_double, count * 4).reshape(-1, 4)[:, :3].copy()
+    except (TypeError, ValueError, RuntimeError, AttributeError):
+        # 无法使用MScriptUtil时逐个读取
+        return np.array([(pt.x, pt.y, pt.z) for pt in (point_array[i] for i in range(count))],
+                        dtype=np.float64).reshape(-1, 3)
+
+def vector_array_to_numpy(vector_array):
+    """ 将MFloatVectorArray转换为(n, 3)的numpy数组，通过MFloatVectorArray.get一次复制到float[n][3]数组 """
+    count = vector_array.length()
+    if not count:
+        return np.empty((0, 3), dtype=np.float64)
+    try:
+        util = script_util_buffer(count * 3)
+        pointer = util.asFloat3Ptr()
+        vector_array.get(pointer)
+        return buffer_view(pointer, ctypes.c_float, count * 3).reshape(-1, 3).astype(np.float64)
+    except (TypeError, ValueError, RuntimeError, AttributeError):
+        return np.array([(vec.x, vec.y, vec.z) for vec in (vector_array[i] for i in range(count))],
+                        dtype=np.float64).reshape(-1, 3)
+
+def numpy_to_point_array(points, point_array=None):
+    """
+        将(n, 3)的numpy数组写入MPointArray，point_array为None时创建新的数组
+        先一次复制到MScriptUtil的double[n][4]数组，再通过MPointArray的构造函数和copy整体写入
+    """
+    if point_array is None:
+        point_array = om.MPointArray()
+    count = len(points)
+    try:
+        util = script_util_buffer(max(count, 1) * 4)
+        pointer = util.asDouble4Ptr()
+        values = buffer_view(pointer, ctypes.c_double, max(count, 1) * 4).reshape(-1, 4)
+        values[:count, :3] = points
+        values[:, 3] = 1.0
+        point_array.copy(om.MPointArray(pointer, count))
+    except (TypeError, ValueError, RuntimeError, AttributeError):
+        point_array.setLength(count)
+        for i, pt in enumerate(np.asarray(points).tolist()):
+            point_array.set(i, pt[0], pt[1], pt[2])
+    return point_array
+
+def matrix_to_numpy(matrix):
+    """ 将MMatrix转换为(4, 4)的numpy数组 """
+    return np.array(matrix_values(matrix), dtype=np.float64).reshape(4, 4)
+
+def matrix_values(matrix):
+    """ MMatrix的16个元素(按行)，可以比较和作为字典的键 """
+    return tuple(matrix(row, column) for row in range(4) for column in range(4))
+
+def iterator_indices(geo_iter, vertex_count=None):
+    """
+        获取迭代器中每个顶点对应的顶点序号
+        vertex_count是几何体的顶点总数，迭代器包含所有顶点时顺序和顶点序号一致，不需要逐个获取
+    """
+    if vertex_count is not None and geo_iter.count() == vertex_count:
+        return np.arange(vertex_count, dtype=np.intp)
+
+    indices = []
+    geo_iter.reset()
+    while not geo_iter.isDone():
+        indices.append(geo_iter.index())
+        geo_iter.next()
+    geo_iter.reset()
+    return np.array(indices, dtype=np.intp)
+
+def mesh_checksum(mesh_obj):
+    """
+        mesh的拓扑和点位置的简易校验值，用来判断mesh是否真的改变了
+        点位置通过getRawPoints直接读取mesh内部的float数组计算adler32，不需要逐个转换顶点
+    Returns:
+        tuple: (顶点数, 面数, 面顶点数, 点位置的adler32)，无法读取内部数组时返回None(当作每次都改变了)
+    """
+    mesh_fn = om.MFnMesh(mesh_obj)
+    vertex_count = mesh_fn.numVertices()
+
+    points_checksum = 1
+    if vertex_count:
+        try:
+            address = int(mesh_fn.getRawPoints())
+        except (TypeError, ValueError, RuntimeError):
+            return None
+        points_checksum = zlib.adler32((ctypes.c_float * (vertex_count * 3)).from_address(address)) & 0xffffffff
+
+    return (vertex_count, mesh_fn.numPolygons(), mesh_fn.numFaceVertices(), points_checksum)
+
+def input_geometry(data_block, multi_index):
+    """ 获取变形器multi_index对应的inputGeom """
+    input_handle = data_block.outputArrayValue(ommpx.cvar.MPxGeometryFilter_input) # 使用outputArray代替inputArray以避免重新计算（外网翻译）
+    input_handle.jumpToElement(multi_index)
+    input_element_handle = input_handle.outputValue()
+
+    return input_element_handle.child(ommpx.cvar.MPxGeometryFilter_inputGeom).asMesh()
+
+def weight_array(data_block, multi_index, vertex_count):
+    """
+        读取multi_index对应的所有绘制权重(weightList[multi_index].weights)
+        没有绘制过的顶点的权重和weightValue一样默认为1
+        weights是multi float属性，数据块没有整体读取的接口，每个已有的元素仍然需要几次maya调用
+        (和逐顶点的weightValue同一个数量级)，所以只在weightList被标记为dirty时调用，不在每一帧调用
+    Returns:
+        numpy.ndarray: (vertex_count,)的权重
+    """
+    weights = np.ones(vertex_count)
+
+    weight_list_handle = data_block.inputArrayValue(ommpx.cvar.MPxDeformerNode_weightList)
+    try:
+        weight_list_handle.jumpToElement(multi_index)
+    except RuntimeError:
+        return weights  # 还没有这个几何体的权重
+
+    weights_handle = om.MArrayDataHandle(weight_list_handle.inputValue().child(ommpx.cvar.MPxDeformerNode_weights))
+    for i in range(weights_handle.elementCount()):
+        weights_handle.jumpToArrayElement(i)
+        index = weights_handle.elementIndex()
+        if index < vertex_count:
+            weights[index] = weights_handle.inputValue().asFloat()
+
+    return weights
+
+def weight_list_index(plug):
+    """ weightList或者weights的plug所在的weightList元素的序号，是整个weightList数组时返回None """
+    while not plug.isNull():
+        if plug == ommpx.cvar.MPxDeformerNode_weightList and plug.isElement():
+            return plug.logicalIndex()
+        if plug.isElement():
+            plug = plug.array()
+        elif plug.isChild():
+            plug = plug.parent()
+        else:
+            return None
+    return None
+
+
+class WeightMap(object):
+    """ 一个几何体的绘制权重：迭代器顺序的稠密权重数组，和权重不为0的顶点在迭代器中的位置 """
+
+    def __init__(self, values):
+        self.values = values
+        self.mask = values != 0
+        self.nonzero = np.flatnonzero(self.mask)
+
+    def is_sparse(self):
+        """ 有权重为0的顶点时，计算核心只需要处理nonzero中的顶点 """
+        return len(self.nonzero) < len(self.values)
+
+
+class PaintWeightCache(object):
+    """
+        所有可以绘制权重的变形器共用的权重缓存，每个multi_index保存一个WeightMap
+        只有weightList被标记为dirty时才重新读取，绘制的权重大部分是0时计算核心只处理不为0的顶点
+    """
+
+    def __init__(self):
+        self.maps = {}  # multi_index -> (迭代器中每个位置的顶点序号, WeightMap)
+
+    def weight_map(self, data_block, multi_index, vertex_count, indices):
+        """
+            获取multi_index的WeightMap，indices是几何体缓存中迭代器每个位置的顶点序号
+            几何体缓存重建后indices是新的数组，这时也重新读取
+        """
+        entry = self.maps.get(multi_index)
+        if entry is None or entry[0] is not indices:
+            entry = (indices, WeightMap(weight_array(data_block, multi_index, vertex_count)[indices]))
+            self.maps[multi_index] = entry
+        return entry[1]
+
+    def dirty(self, plug):
+        """ 在setDependentsDirty中调用，weightList改变时清空对应的权重 """
+        if plug == ommpx.cvar.MPxDeformerNode_weightList or plug == ommpx.cvar.MPxDeformerNode_weights:
+            index = weight_list_index(plug)
+            if index is None:
+                self.maps.clear()
+            else:
+                self.maps.pop(index, None)
+
+
+def create_fingerprint_attributes():
+    """
+        创建显示输入指纹命中和未命中次数的属性(只读，不保存到文件)，可以通过getAttr查看
+    Returns:
+        (MObject, MObject): fingerprintHits, fingerprintMisses
+    """
+    numeric_attr = om.MFnNumericAttribute()
+    attributes = []
+    for long_name, short_name in (("fingerprintHits", "fpHits"), ("fingerprintMisses", "fpMisses")):
+        attributes.append(numeric_attr.create(long_name, short_name, om.MFnNumericData.kInt, 0))
+        numeric_attr.setStorable(False)
+        numeric_attr.setWritable(False)
+    return tuple(attributes)
+
+
+class FingerprintCache(object):
+    """
+        保存每个multi_index上一次的输入指纹和输出的顶点位置
+        场景中无关的部分让变形器被标记为dirty时，输入的指纹和上一次一致，直接返回上一次的输出
+    """
+
+    def __init__(self, hits_attr, misses_attr):
+        self.hits_attr = hits_attr
+        self.misses_attr = misses_attr
+
+        self.entries = {}  # multi_index -> (指纹, 输出的MPointArray)
+        self.hits = 0
+        self.misses = 0
+
+        # 不是mesh的输入几何体无法快速计算校验值，使用inputGeom被标记为dirty的次数代替
+        self.input_generation = 0
+        self.input_generations = {}  # multi_index -> inputGeom被标记为dirty的次数
+        self.weights_generation = 0  # weightList被标记为dirty的次数
+
+        # 开启frameCache时，输出同时按(multi_index, 帧, 指纹)保存，来回拖动时间滑块时使用以前的结果
+        self.frame_cache = FrameCache()
+        self.frame = None  # 这一次计算的帧，为None时不使用按帧的缓存
+
+    def use_frame_cache(self, node, data_block, enabled_attr, budget_attr):
+        """ 在deform和compute的开始调用，读取frameCache和frameCacheBudget，开启时记录这一次计算的帧 """
+        handle = om.MObjectHandle(node.thisMObject())
+        if not data_block.inputValue(enabled_attr).asBool():
+            self.frame = None
+            self.frame_cache.clear()
+            _frame_cache_nodes.pop(handle.hashCode(), None)
+            return
+
+        _frame_cache_nodes[handle.hashCode()] = (handle, self.frame_cache)
+        self.frame_cache.set_budget(int(data_block.inputValue(budget_attr).asFloat() * 1024 * 1024))
+
+        # 在其他时间计算(例如按时间范围计算)时使用上下文的时间
+        context = data_block.context()
+        time = om.MTime()
+        if context.isNormal():
+            time = om.MAnimControl.currentTime()
+        else:
+            context.getTime(time)
+        self.frame = time.value()
+
+    def input_state(self, data_block, multi_index):
+        """ 输入几何体的状态，mesh使用点位置的校验值 """
+        input_handle = data_block.outputArrayValue(ommpx.cvar.MPxGeometryFilter_input)
+        input_handle.jumpToElement(multi_index)
+        input_geom = input_handle.outputValue().child(ommpx.cvar.MPxGeometryFilter_inputGeom).data()
+
+        if input_geom.hasFn(om.MFn.kMeshData):
+            checksum = mesh_checksum(input_geom)
+            if checksum is not None:
+                return checksum
+        return (self.input_generation, self.input_generations.get(multi_index, 0))
+
+    def restore(self, data_block, multi_index, fingerprint, geo_iter):
+        """ 指纹和上一次一致时把上一次的输出写回迭代器，返回True """
+        entry = self.entries.get(multi_index)
+        hit = fingerprint is not None and entry is not None and entry[0] == fingerprint and \
+            entry[1].length() == geo_iter.count()
+        if hit:
+            geo_iter.setAllPositions(entry[1])
+        elif fingerprint is not None and self.frame is not None:
+            output = self.frame_cache.get((multi_index, self.frame, fingerprint))
+            hit = output is not None and output.length() == geo_iter.count()
+            if hit:
+                geo_iter.setAllPositions(output)
+                # 之后的计算和这一帧的结果对比
+                buffer = entry[1] if entry is not None else om.MPointArray()
+                buffer.copy(output)
+                self.entries[multi_index] = (fingerprint, buffer)
+
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        data_block.outputValue(self.hits_attr).setInt(self.hits)
+        data_block.outputValue(self.misses_attr).setInt(self.misses)
+        return hit
+
+    def store(self, multi_index, fingerprint, geo_iter):
+        """ 保存这一次的指纹和输出，指纹为None(无法判断输入是否改变)时不保存 """
+        if fingerprint is None:
+            self.entries.pop(multi_index, None)
+            return
+
+        entry = self.entries.get(multi_index)
+        output = entry[1] if entry is not None else om.MPointArray() # 重复使用上一次的数组
+        geo_iter.allPositions(output)
+        self.entries[multi_index] = (fingerprint, output)
+
+        if self.frame is not None:
+            self.frame_cache.put((multi_index, self.frame, fingerprint), om.MPointArray(output))
+
+    def dirty(self, plug):
+        """ 在setDependentsDirty中调用，记录inputGeom和绘制权重被标记为dirty """
+        if plug == ommpx.cvar.MPxGeometryFilter_inputGeom or plug == ommpx.cvar.MPxGeometryFilter_input:
+            element_plug = plug.parent() if plug.isChild() else plug
+            if element_plug.isElement():
+                index = element_plug.logicalIndex()
+                self.input_generations[index] = self.input_generations.get(index, 0) + 1
+            else:
+                self.input_generation += 1
+
+        elif plug == ommpx.cvar.MPxDeformerNode_weightList or plug == ommpx.cvar.MPxDeformerNode_weights:
+            self.weights_generation += 1
+
+    def stats(self):
+        """ 命中次数，未命中次数，命中率 """
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / float(total) if total else 0.0}
+
+
+def create_frame_cache_attributes():
+    """
+        创建按帧缓存输出的属性
+    Returns:
+        (MObject, MObject): frameCache(是否按帧缓存输出), frameCacheBudget(缓存的内存上限，单位MB)
+    """
+    numeric_attr = om.MFnNumericAttribute()
+    frame_cache = numeric_attr.create("frameCache", "frCache", om.MFnNumericData.kBoolean, False)
+    numeric_attr.setKeyable(False)
+    numeric_attr.setChannelBox(True)
+
+    frame_cache_budget = numeric_attr.create("frameCacheBudget", "frBudget", om.MFnNumericData.kFloat, 256.0)
+    numeric_attr.setKeyable(False)
+    numeric_attr.setChannelBox(True)
+    numeric_attr.setMin(1.0)
+    return frame_cache, frame_cache_budget
+
+
+class FrameCache(object):
+    """
+        按(multi_index, 帧, 输入指纹)保存输出的顶点位置(MPointArray)
+        占用的内存超过预算时，淘汰最久没有使用的结果(LRU)
+    """
+
+    POINT_BYTES = 32  # MPoint是4个double
+
+    def __init__(self, budget=256 * 1024 * 1024):
+        self.entries = collections.OrderedDict()  # 键 -> MPointArray，最近使用的在最后
+        self.budget = budget  # 字节数
+        self.resident = 0  # 所有结果占用的字节数
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """ 返回key对应的输出，没有时返回None """
+        output = self.entries.pop(key, None)
+        if output is None:
+            self.misses += 1
+            return None
+        self.entries[key] = output  # 重新插入到最后，python2的OrderedDict没有move_to_end
+        self.hits += 1
+        return output
+
+    def put(self, key, output):
+        """ 保存一个输出，超过预算时淘汰最久没有使用的结果，比预算还大的输出不保存 """
+        size = output.length() * FrameCache.POINT_BYTES
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.resident -= previous.length() * FrameCache.POINT_BYTES
+        if size > self.budget:
+            return
+
+        self.entries[key] = output
+        self.resident += size
+        self.evict()
+
+    def set_budget(self, budget):
+        """ 修改预算，变小时立即淘汰 """
+        if budget != self.budget:
+            self.budget = budget
+            self.evict()
+
+    def evict(self):
+        while self.resident > self.budget and self.entries:
+            _, output = self.entries.popitem(last=False)
+            self.resident -= output.length() * FrameCache.POINT_BYTES
+            self.evictions += 1
+
+    def clear(self):
+        """ 释放所有的结果，统计的次数不变 """
+        self.entries.clear()
+        self.resident = 0
+
+    def stats(self):
+        """ 命中次数，未命中次数，命中率，保存的结果数，占用的字节数，预算，淘汰次数 """
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / float(total) if total else 0.0,
+                "entries": len(self.entries), "resident_bytes": self.resident, "budget_bytes": self.budget,
+                "evictions": self.evictions}
+
+
+_frame_cache_nodes = {}  # 开启了frameCache的节点，hashCode -> (MObjectHandle, FrameCache)
+
+
+def frame_caches():
+    """ 返回开启了frameCache的节点的[(节点名, FrameCache)]，顺便移除已经删除的节点 """
+    result = []
+    for key, (handle, frame_cache) in list(_frame_cache_nodes.items()):
+        if not handle.isValid():
+            del _frame_cache_nodes[key]
+            continue
+        result.append((om.MFnDependencyNode(handle.object()).name(), frame_cache))
+    return sorted(result, key=lambda item: item[0])
+
+
+class BufferPool(object):
+    """
+        每个节点一个，保存在多次计算之间重复使用的数组，避免每次deform都创建新的数组
+        数组按键保存，只有长度改变(顶点数改变)时才重新分配
+    """
+
+    def __init__(self):
+        self.buffers = {}
+        self.allocations = 0  # 创建和重新分配数组的次数
+
+    def array(self, key, array_type, length=None):
+        """
+            获取maya数组(MPointArray, MFloatVectorArray等)
+        Args:
+            key: 数组的键
+            array_type (type): 数组的类型
+            length (int): 需要的长度，为None时不改变长度(交给allPositions等函数填充)
+        """
+        buffer = self.buffers.get(key)
+        if buffer is None or not isinstance(buffer, array_type):
+            buffer = array_type()
+            self.buffers[key] = buffer
+            self.allocations += 1
+        if length is not None and buffer.length() != length:
+            buffer.setLength(length)
+            self.allocations += 1
+        return buffer
+
+    def numpy_array(self, key, shape, dtype=None):
+        """ 获取形状为shape的numpy数组，内容是上一次使用时的值 """
+        dtype = np.float64 if dtype is None else dtype
+        buffer = self.buffers.get(key)
+        if buffer is None or not isinstance(buffer, np.ndarray) or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self.buffers[key] = buffer
+            self.allocations += 1
+        return buffer
+
+    def release(self, key=None):
+        """ 释放key对应的数组，key为None时释放所有的数组 """
+        if key is None:
+            self.buffers.clear()
+        else:
+            self.buffers.pop(key, None)
+
+
+def set_allocation_tracking(enabled, frames=1):
+    """
+        开启或者关闭tracemalloc，开启后所有节点的AllocationCounter开始统计
+        tracemalloc会明显拖慢python对象的分配，只在测量时开启
+    """
+    if tracemalloc is None:
+        om.MGlobal.displayWarning("tracemalloc is not available in this python version")
+        return
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def create_allocation_attributes():
+    """
+        创建显示内存分配统计的属性(只读，不保存到文件)，开启set_allocation_tracking后可以通过getAttr查看
+    Returns:
+        (MObject, MObject): allocationBlocks(平均每次计算保留的新内存块数), allocationPeakBytes(临时内存的峰值)
+    """
+    numeric_attr = om.MFnNumericAttribute()
+    attributes = []
+    for long_name, short_name in (("allocationBlocks", "allocBlocks"), ("allocationPeakBytes", "allocPeak")):
+        attributes.append(numeric_attr.create(long_name, short_name, om.MFnNumericData.kDouble, 0.0))
+        numeric_attr.setStorable(False)
+        numeric_attr.setWritable(False)
+    return tuple(attributes)
+
+
+class AllocationCounter(object):
+    """
+        统计每次deform中python分配的内存，tracemalloc没有开启时不做任何事情
+        blocks是deform结束后还保留着的新内存块数，peak_bytes是deform中临时分配的峰值
+        blocks_attr和peak_attr是create_allocation_attributes创建的属性，统计结果通过publish写入节点
+    """
+
+    def __init__(self, blocks_attr=None, peak_attr=None):
+        self.blocks_attr = blocks_attr
+        self.peak_attr = peak_attr
+
+        self.evaluations = 0
+        self.blocks = 0
+        self.peak_bytes = 0
+        self.last_blocks = 0
+        self.last_peak_bytes = 0
+        self.snapshot = None
+        self.start_bytes = 0
+
+    def __enter__(self):
+        self.snapshot = None
+        if tracemalloc is not None and tracemalloc.is_tracing():
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            self.start_bytes = tracemalloc.get_traced_memory()[0]
+            self.snapshot = tracemalloc.take_snapshot()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.snapshot is None or not tracemalloc.is_tracing():
+            return False
+
+        peak_bytes = tracemalloc.get_traced_memory()[1] - self.start_bytes
+        statistics = tracemalloc.take_snapshot().compare_to(self.snapshot, "lineno")
+        self.last_blocks = sum(stat.count_diff for stat in statistics if stat.count_diff > 0)
+        self.last_peak_bytes = max(peak_bytes, 0)
+
+        self.evaluations += 1
+        self.blocks += self.last_blocks
+        self.peak_bytes = max(self.peak_bytes, self.last_peak_bytes)
+        self.snapshot = None
+        return False
+
+    def stats(self):
+        """ 统计的deform次数，平均每次保留的新内存块数，最后一次和所有统计中的峰值临时内存 """
+        return {
+            "evaluations": self.evaluations,
+            "blocks_per_evaluation": self.blocks / float(self.evaluations) if self.evaluations else 0.0,
+            "last_blocks": self.last_blocks,
+            "last_peak_bytes": self.last_peak_bytes,
+            "peak_bytes": self.peak_bytes,
+        }
+
+    def publish(self, data_block):
+        """ 把平均内存块数和峰值写入节点的属性，没有统计过时不写入 """
+        if not self.evaluations or self.blocks_attr is None:
+            return
+        data_block.outputValue(self.blocks_attr).setDouble(self.blocks / float(self.evaluations))
+        data_block.outputValue(self.peak_attr).setDouble(self.peak_bytes)
+
+
+def count_allocations(deform):
+    """ 装饰节点的deform，开启set_allocation_tracking时用节点的allocations统计每次计算分配的内存 """
+    @functools.wraps(deform)
+    def wrapper(self, data_block, geo_iter, matrix, multi_index):
+        try:
+            with self.allocations:
+                return deform(self, data_block, geo_iter, matrix, multi_index)
+        finally:
+            self.allocations.publish(data_block)
+    return wrapper
+
+
+_thread_pool = None  # 所有节点共用的线程池，第一次使用时创建
+_thread_pool_lock = threading.Lock()  # 并行计算时多个节点可能同时第一次使用线程池
+
+
+def thread_pool():
+    """ 返回共用的线程池，线程数和cpu核数一致。numpy在计算大数组时会释放GIL，多个几何体可以同时计算 """
+    global _thread_pool
+    with _thread_pool_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPool(multiprocessing.cpu_count())
+        return _thread_pool
+
+
+def node_is_disabled(node, data_block):
+    """ nodeState不是normal时(例如hasNoEffect)变形器不应该改变几何体 """
+    return data_block.inputValue(ommpx.cvar.MPxNode_state).asShort() != 0
+
+
+def geometry_matrix(geometry_handle):
+    """
+        几何体数据中保存的世界空间矩阵，和maya传给deform的matrix一致，没有矩阵时是单位矩阵
+    """
+    matrix = om.MMatrix()
+    geometry_obj = geometry_handle.data()
+    if not geometry_obj.isNull() and geometry_obj.hasFn(om.MFn.kGeometryData):
+        try:
+            om.MFnGeometryData(geometry_obj).getMatrix(matrix)
+        except RuntimeError:
+            matrix = om.MMatrix()
+    return matrix
+
+
+def parallel_compute(node, data_block, prepare):
+    """
+        在compute中一次计算变形器的所有几何体(所有multi_index)，代替maya逐个调用deform
+        每个几何体的输出先复制输入，然后在主线程中调用prepare(geo_iter, world_matrix, multi_index)读取maya的数据
+        prepare返回(job, finish)，job只使用numpy，所有几何体的job在线程池中同时运行，
+        finish(job的结果)再回到主线程中把结果写回geo_iter。prepare返回None时输出和输入一致
+    """
+    input_array = data_block.inputArrayValue(ommpx.cvar.MPxGeometryFilter_input)
+    output_array = data_block.outputArrayValue(ommpx.cvar.MPxGeometryFilter_outputGeom)
+
+    pending = []
+    handles = []
+    for i in range(input_array.elementCount()):
+        input_array.jumpToArrayElement(i)
+        multi_index = input_array.elementIndex()
+        input_element = input_array.inputValue()
+        try:
+            output_array.jumpToElement(multi_index)
+        except RuntimeError:
+            continue  # 这个几何体的输出没有连接
+
+        output_handle = output_array.outputValue()
+        output_handle.copy(input_element.child(ommpx.cvar.MPxGeometryFilter_inputGeom))
+        handles.append(output_handle)
+
+        world_matrix = geometry_matrix(input_element.child(ommpx.cvar.MPxGeometryFilter_inputGeom))
+
+        group_id = input_element.child(ommpx.cvar.MPxGeometryFilter_groupId).asLong()
+        geo_iter = om.MItGeometry(output_handle, group_id, False)
+        work = prepare(geo_iter, world_matrix, multi_index)
+        if work is not None:
+            pending.append((geo_iter, work))
+
+    # 只有一个几何体时不需要线程池
+    if len(pending) > 1:
+        results = thread_pool().map(lambda item: item[1][0](), pending)
+    else:
+        results = [work[0]() for _, work in pending]
+
+    for (geo_iter, (job, finish)), result in zip(pending, results):
+        finish(result)
+
+    for output_handle in handles:
+        output_handle.setClean()
+    output_array.setAllClean()
+
+
+def create_lod_attributes():
+    """
+        创建播放时简化计算的属性
+    Returns:
+        (MObject, MObject): playbackLod(是否在播放时只计算顶点子集), lodRatio(子集的顶点比例)
+    """
+    numeric_attr = om.MFnNumericAttribute()
+    playback_lod = numeric_attr.create("playbackLod", "pbLod", om.MFnNumericData.kBoolean, False)
+    numeric_attr.setKeyable(False)
+    numeric_attr.setChannelBox(True)
+
+    lod_ratio = numeric_attr.create("lodRatio", "lodR", om.MFnNumericData.kFloat, 0.25)
+    numeric_attr.setKeyable(False)
+    numeric_attr.setChannelBox(True)
+    numeric_attr.setMin(0.01)
+    numeric_attr.setMax(1.0)
+    return playback_lod, lod_ratio
+
+
+_lod_nodes = {}  # 播放时使用了简化计算的节点，hashCode -> MObjectHandle
+_playback_callback_id = None  # playingBack回调的id
+_playback_callback_count = 0  # 注册回调的插件数
+
+
+def playback_lod_ratio(node, data_block, playback_lod_attr, lod_ratio_attr):
+    """
+        正在播放并且开启了playbackLod时返回子集的顶点比例，否则返回None(完整计算)
+        比例不小于1时子集就是所有顶点，直接完整计算
+        使用了简化计算的节点会在播放停止时被标记为dirty，重新完整计算
+    """
+    if not data_block.inputValue(playback_lod_attr).asBool() or not om.MAnimControl.isPlaying():
+        return None
+
+    ratio = data_block.inputValue(lod_ratio_attr).asFloat()
+    if ratio >= 1.0:
+        return None
+
+    handle = om.MObjectHandle(node.thisMObject())
+    _lod_nodes[handle.hashCode()] = handle
+    return ratio
+
+
+def playback_changed(playing, client_data=None):
+    """ 播放停止时把使用了简化计算的节点标记为dirty，恢复完整的计算 """
+    if playing:
+        return
+
+    handles = list(_lod_nodes.values())
+    _lod_nodes.clear()
+    for handle in handles:
+        if handle.isValid():
+            cmds.dgdirty(om.MFnDependencyNode(handle.object()).name())
+    if handles:
+        cmds.refresh()
+
+
+def register_playback_callback():
+    """ 在initializePlugin中调用，多个插件共用一个playingBack的回调 """
+    global _playback_callback_id, _playback_callback_count
+    if _playback_callback_count == 0:
+        _playback_callback_id = om.MConditionMessage.addConditionCallback("playingBack", playback_changed)
+    _playback_callback_count += 1
+
+
+def deregister_playback_callback():
+    """ 在uninitializePlugin中调用，最后一个插件卸载时移除回调 """
+    global _playback_callback_id, _playback_callback_count
+    _playback_callback_count = max(_playback_callback_count - 1, 0)
+    if _playback_callback_count == 0 and _playback_callback_id is not None:
+        om.MMessage.removeCallback(_playback_callback_id)
+        _playback_callback_id = None
@@ -0,0 +1,148 @@
+# coding: utf-8
+# 通过MDGContext在一个时间范围内计算多个属性的值，不改变场景的当前时间，也不刷新视图
+import maya.api.OpenMaya as om
+import maya.cmds as cmds
+
+
+def maya_useNewAPI():
+    """ 告知maya,使用的是maya api 2.0 """
+    pass
+
+
+def leaf_plugs(plug):
+    """ 复合属性(例如translate)展开为所有的子属性 """
+    if not plug.isCompound:
+        return [plug]
+    plugs = []
+    for i in range(plug.numChildren()):
+        plugs.extend(leaf_plugs(plug.child(i)))
+    return plugs
+
+
+def value_converter(plug):
+    """ 返回把asDouble的结果(内部单位)转换为界面单位的函数，角度是弧度转换为度，距离是厘米转换为场景单位 """
+    attribute = plug.attribute()
+    if attribute.hasFn(om.MFn.kUnitAttribute):
+        unit_type = om.MFnUnitAttribute(attribute).unitType()
+        if unit_type == om.MFnUnitAttribute.kAngle:
+            return lambda value: om.MAngle(value).asUnits(om.MAngle.uiUnit())
+        if unit_type == om.MFnUnitAttribute.kDistance:
+            return lambda value: om.MDistance(value).asUnits(om.MDistance.uiUnit())
+        if unit_type == om.MFnUnitAttribute.kTime:
+            return lambda value: om.MTime(value).asUnits(om.MTime.uiUnit())
+    return None
+
+
+def evaluate_frame(plugs, converters, frame):
+    """ 在frame这一帧计算所有属性，返回值的列表 """
+    context = om.MDGContext(om.MTime(frame, om.MTime.uiUnit()))
+    if hasattr(om, "MDGContextGuard"):
+        with om.MDGContextGuard(context):
+            values = [plug.asDouble() for plug in plugs]
+    else:
+        values = [plug.asDouble(context) for plug in plugs]  # 2018及之前的版本
+    return [value if converter is None else converter(value) for value, converter in zip(values, converters)]
+
+
+class EvaluateTimeRangeCmd(om.MPxCommand):
+    """
+        evaluateTimeRange -startTime 1 -endTime 100 "distanceBetweenLocator1.distance" "rollingnode1.rotation"
+        返回按帧排列的一维数组: [第1帧的属性1, 第1帧的属性2, ..., 第2帧的属性1, ...]，长度是帧数 * 属性数
+        复合属性展开为子属性。不指定时间时使用时间滑块的播放范围
+        所有帧都在主线程中计算，maya的依赖图不能在其他线程中计算
+    """
+    COMMAND_NAME = "evaluateTimeRange"
+    # 定义命令的标志
+    START_FLAG = ["-st", "-startTime", om.MSyntax.kDouble]
+    END_FLAG = ["-et", "-endTime", om.MSyntax.kDouble]
+    STEP_FLAG = ["-by", "-step", om.MSyntax.kDouble]
+
+    def __init__(self):
+        super(EvaluateTimeRangeCmd, self).__init__()
+
+    def doIt(self, arg_list):
+        try:
+            arg_db = om.MArgDatabase(self.syntax(), arg_list) # 创建对象解析语法与参数
+        except:
+            self.displayError("Error parsing arguments")
+            raise
+
+        start = om.MAnimControl.minTime().asUnits(om.MTime.uiUnit())
+        end = om.MAnimControl.maxTime().asUnits(om.MTime.uiUnit())
+        step = 1.0
+        if arg_db.isFlagSet(EvaluateTimeRangeCmd.START_FLAG[0]):
+            start = arg_db.flagArgumentDouble(EvaluateTimeRangeCmd.START_FLAG[0], 0)
+        if arg_db.isFlagSet(EvaluateTimeRangeCmd.END_FLAG[0]):
+            end = arg_db.flagArgumentDouble(EvaluateTimeRangeCmd.END_FLAG[0], 0)
+        if arg_db.isFlagSet(EvaluateTimeRangeCmd.STEP_FLAG[0]):
+            step = arg_db.flagArgumentDouble(EvaluateTimeRangeCmd.STEP_FLAG[0], 0)
+        if step <= 0 or end < start:
+            raise RuntimeError("Invalid frame range {0} to {1} by {2}".format(start, end, step))
+
+        selection_list = arg_db.getObjectList()
+        plugs = []
+        for i in range(selection_list.length()):
+            plugs.extend(leaf_plugs(selection_list.getPlug(i)))
+        converters = [value_converter(plug) for plug in plugs]
+
+        frames = [start + i * step for i in range(int((end - start) / step + 1e-6) + 1)]
+        rows = [evaluate_frame(plugs, converters, frame) for frame in frames]
+
+        result = om.MDoubleArray()
+        result.setLength(len(frames) * len(plugs))
+        for i, value in enumerate(value for row in rows for value in row):
+            result[i] = value
+        self.setResult(result)
+
+    @classmethod
+    def creator(cls):
+        """ 注册maya命令时使用的方法，用来得到类的实例 """
+        return EvaluateTimeRangeCmd()
+
+    @classmethod
+    def create_syntax(cls):
+
+        syntax = om.MSyntax()
+
+        syntax.addFlag(*cls.START_FLAG)
+        syntax.addFlag(*cls.END_FLAG)
+        syntax.addFlag(*cls.STEP_FLAG)
+
+        # 要计算的属性，例如"rollingnode1.rotation"
+        syntax.setObjectType(om.MSyntax.kSelectionList, 1)
+
+        return syntax
+
+
+def initializePlugin(plugin):
+    """ 插件加载时执行这个函数"""
+    vendor = "RuiChen"  # 插件制作人的名字
+    version = "1.0.0"  # 插件的版本
+
+    plugin_fn = om.MFnPlugin(plugin, vendor, version)  # 定义插件
+
+    try:
+        plugin_fn.registerCommand(EvaluateTimeRangeCmd.COMMAND_NAME, EvaluateTimeRangeCmd.creator, EvaluateTimeRangeCmd.create_syntax)
+    except:
+        om.MGlobal.displayError("Failed to register command: {0}".format(EvaluateTimeRangeCmd.COMMAND_NAME))  # 注册失败时输出
+
+
+def uninitializePlugin(plugin):
+    """ 插件取消加载时执行这个函数 """
+    plugin_fn = om.MFnPlugin(plugin)
+    try:
+        plugin_fn.deregisterCommand(EvaluateTimeRangeCmd.COMMAND_NAME)  # 取消注册新命令
+    except:
+        om.MGlobal.displayError("Failed to deregister command: {0}".format(EvaluateTimeRangeCmd.COMMAND_NAME))  # 取消注册失败时输出
+
+
+if __name__ == '__main__':
+    plugin_name = "evaluate_time_range_cmd.py"  # 插件的文件名
+    # 如果插件加载了就先取消加载插件
+    cmds.evalDeferred(
+        'if cmds.pluginInfo("{0}", q=True, loaded=True): cmds.unloadPlugin("{0}")'.format(plugin_name))
+    # 如果插件没有加载就加载插件
+    cmds.evalDeferred(
+        'if not cmds.pluginInfo("{0}", q=True, loaded=True): cmds.loadPlugin("{0}")'.format(plugin_name))
+
+    cmds.evalDeferred('print(cmds.evaluateTimeRange("rollingnode1.rotation", startTime=1, endTime=24))')
@@ -0,0 +1,265 @@
+# coding: utf-8
+import ast
+import math
+import re
+
+import maya.api.OpenMaya as om
+import maya.cmds as cmds
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # maya自带的python不一定安装了numpy，没有numpy时只能使用标量输入
+
+def maya_useNewAPI():
+    """ 这个函数告诉了maya这个插件生成,并且生成的对象使用maya python api 2.0 """
+    pass
+
+
+# 公式中可以使用的函数和常量，有numpy时所有函数都可以作用于数组
+if np is not None:
+    FUNCTIONS = {
+        "sin": np.sin, "cos": np.cos, "tan": np.tan, "asin": np.arcsin, "acos": np.arccos, "atan": np.arctan,
+        "atan2": np.arctan2, "sqrt": np.sqrt, "exp": np.exp, "log": np.log, "log10": np.log10, "abs": np.abs,
+        "floor": np.floor, "ceil": np.ceil, "pow": np.power, "min": np.minimum, "max": np.maximum,
+        "clamp": np.clip, "where": np.where, "degrees": np.degrees, "radians": np.radians,
+        "sum": np.sum, "mean": np.mean, "pi": math.pi, "e": math.e,
+    }
+else:
+    FUNCTIONS = {
+        "sin": math.sin, "cos": math.cos, "tan": math.tan, "asin": math.asin, "acos": math.acos, "atan": math.atan,
+        "atan2": math.atan2, "sqrt": math.sqrt, "exp": math.exp, "log": math.log, "log10": math.log10, "abs": abs,
+        "floor": math.floor, "ceil": math.ceil, "pow": math.pow, "min": min, "max": max,
+        "clamp": lambda value, low, high: min(max(value, low), high), "where": lambda condition, a, b: a if condition else b,
+        "degrees": math.degrees, "radians": math.radians, "pi": math.pi, "e": math.e,
+    }
+
+SCALAR_NAME = re.compile(r"^x(\d+)$")  # x0, x1...对应input[0], input[1]...
+ARRAY_NAME = re.compile(r"^v(\d+)$")  # v0, v1...对应inputArray[0], inputArray[1]...
+
+# 公式中允许的语法，只有算术、比较和函数调用，不能访问属性、下标或者定义变量
+ALLOWED_NODES = tuple(node for node in (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.IfExp, ast.Call, ast.Name, ast.Load,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.UAdd, ast.USub,
+    ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+    getattr(ast, "Constant", None), getattr(ast, "Num", None),  # python3.8之前数字是ast.Num
+) if node is not None)
+
+_compiled_formulas = {}  # 公式 -> (代码对象, 使用的x序号, 使用的v序号)，所有节点共用
+
+
+def compile_formula(formula):
+    """
+        检查公式的语法并编译，同一个公式只编译一次
+    Returns:
+        (code, list, list): 编译后的代码对象，公式中使用的x的序号，使用的v的序号
+    Raises:
+        SyntaxError, ValueError: 公式不合法
+    """
+    compiled = _compiled_formulas.get(formula)
+    if compiled is not None:
+        return compiled
+
+    tree = ast.parse(formula.strip(), mode="eval")
+    scalar_indices = set()
+    array_indices = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError("{0} is not allowed in a formula".format(type(node).__name__))
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+                raise ValueError("only calls to {0} are allowed".format(", ".join(sorted(FUNCTIONS))))
+        elif isinstance(node, ast.Name):
+            scalar_match = SCALAR_NAME.match(node.id)
+            array_match = ARRAY_NAME.match(node.id)
+            if scalar_match:
+                scalar_indices.add(int(scalar_match.group(1)))
+            elif array_match:
+                array_indices.add(int(array_match.group(1)))
+            elif node.id not in FUNCTIONS:
+                raise ValueError("unknown name {0}".format(node.id))
+        elif isinstance(node, getattr(ast, "Constant", ())):
+            if not isinstance(node.value, (int, float)):
+                raise ValueError("only numeric constants are allowed")
+            # 整数常量转换为float，"9**9**9"这样的整数幂会计算很久(卡住maya)，float的幂溢出时会抛出OverflowError
+            node.value = float(node.value)
+        elif isinstance(node, getattr(ast, "Num", ())):
+            node.n = float(node.n)
+
+    compiled = (compile(tree, "<formula>", "eval"), sorted(scalar_indices), sorted(array_indices))
+    _compiled_formulas[formula] = compiled
+    return compiled
+
+
+def result_values(result):
+    """ 公式的结果转换为float的列表，标量是只有一个元素的列表 """
+    if np is not None:
+        return np.asarray(result, dtype=np.float64).ravel().tolist()
+    if isinstance(result, (list, tuple)):
+        return [float(value) for value in result]
+    return [float(result)]
+
+
+class ExpressionNode(om.MPxNode):
+    """
+        用一个公式代替一串multiplynode、rollingnode之类的小节点，所有运算在一次compute中完成
+        公式中x0, x1...是input数组的元素(标量)，v0, v1...是inputArray数组的元素(doubleArray，需要numpy)
+        例如: "x0 * x1"，"x0 / max(x1, 0.001)"，"v0 * x0 + v1"
+        结果是标量时写入output，是数组时写入outputArray(output是第一个元素)
+    """
+    TYPE_NAME = "expressionnode"
+    TYPE_ID = om.MTypeId(0x0007F800)
+    # 提前声明节点的属性
+    formula_obj = None
+    input_obj = None
+    input_array_obj = None
+    output_obj = None
+    output_array_obj = None
+
+    def __init__(self):
+        super(ExpressionNode, self).__init__()
+
+        self.error_formula = None  # 上一次出错的公式，同一个公式的错误只提示一次
+
+    def compute(self, plug, data):
+        """_summary_
+
+        Args:
+            plug (_type_): 当plug是dirty状态时,会传过来,要求更新
+            data (_type_): data提供了读取和写入节点属性值的方法
+        """
+        if plug != ExpressionNode.output_obj and plug != ExpressionNode.output_array_obj:
+            return None
+
+        formula = data.inputValue(ExpressionNode.formula_obj).asString()
+        values = [0.0]
+        if formula.strip():
+            try:
+                code, scalar_indices, array_indices = compile_formula(formula)
+                namespace = dict(FUNCTIONS)
+                scalars = self.read_scalars(data)
+                arrays = self.read_arrays(data)
+                for index in scalar_indices:
+                    namespace["x{0}".format(index)] = scalars.get(index, 0.0)  # 没有设置的输入为0
+                for index in array_indices:
+                    namespace["v{0}".format(index)] = arrays.get(index, np.empty(0) if np is not None else [])  # 没有连接的输入是空数组
+                values = result_values(eval(code, {"__builtins__": {}}, namespace))
+                self.error_formula = None
+            except (SyntaxError, ValueError, TypeError, ArithmeticError) as error:
+                if formula != self.error_formula:
+                    om.MGlobal.displayWarning("{0}: cannot evaluate '{1}': {2}".format(self.name(), formula, error))
+                    self.error_formula = formula
+                values = [0.0]
+
+        # 两个输出一起计算，只计算一次公式
+        data.outputValue(ExpressionNode.output_obj).setDouble(values[0] if values else 0.0)
+        data.outputValue(ExpressionNode.output_array_obj).setMObject(om.MFnDoubleArrayData().create(values))
+
+        data.setClean(ExpressionNode.output_obj)
+        data.setClean(ExpressionNode.output_array_obj)
+
+    def read_scalars(self, data):
+        """ input数组: 逻辑序号 -> 值 """
+        scalars = {}
+        array_handle = data.inputArrayValue(ExpressionNode.input_obj)
+        for i in range(len(array_handle)):
+            array_handle.jumpToPhysicalElement(i)
+            scalars[array_handle.elementLogicalIndex()] = array_handle.inputValue().asDouble()
+        return scalars
+
+    def read_arrays(self, data):
+        """ inputArray数组: 逻辑序号 -> numpy数组(没有numpy时是列表) """
+        arrays = {}
+        array_handle = data.inputArrayValue(ExpressionNode.input_array_obj)
+        for i in range(len(array_handle)):
+            array_handle.jumpToPhysicalElement(i)
+            values = om.MFnDoubleArrayData(array_handle.inputValue().data()).array()
+            # np.fromiter一次转换，不先创建中间的列表
+            arrays[array_handle.elementLogicalIndex()] = np.fromiter(values, np.float64, len(values)) if np is not None else list(values)
+        return arrays
+
+    @classmethod
+    def creator(cls):
+        return ExpressionNode()
+
+    @classmethod
+    def initialize(cls):
+        typed_attr = om.MFnTypedAttribute() # 创建一个用来设置数据类型属性的对象
+        cls.formula_obj = typed_attr.create("formula", "fml", om.MFnData.kString, om.MFnStringData().create("x0"))
+
+        cls.input_array_obj = typed_attr.create("inputArray", "ia", om.MFnData.kDoubleArray, om.MFnDoubleArrayData().create())
+        typed_attr.array = True  # 每个元素是一个doubleArray，公式中是v0, v1...
+        typed_attr.readable = False
+
+        cls.output_array_obj = typed_attr.create("outputArray", "oa", om.MFnData.kDoubleArray, om.MFnDoubleArrayData().create())
+        typed_attr.writable = False
+        typed_attr.storable = False
+
+        numeric_attr = om.MFnNumericAttribute() # 创建一个用来设置数字系列属性的对象
+        cls.input_obj = numeric_attr.create("input", "i", om.MFnNumericData.kDouble, 0.0)
+        numeric_attr.array = True  # 公式中是x0, x1...
+        numeric_attr.keyable = True
+        numeric_attr.readable = False
+
+        cls.output_obj = numeric_attr.create("output", "o", om.MFnNumericData.kDouble, 0.0)
+        numeric_attr.writable = False
+        numeric_attr.storable = False
+
+        # 添加属性
+        cls.addAttribute(cls.formula_obj)
+        cls.addAttribute(cls.input_obj)
+        cls.addAttribute(cls.input_array_obj)
+        cls.addAttribute(cls.output_obj)
+        cls.addAttribute(cls.output_array_obj)
+        # 设置属性影响
+        for input_attr in (cls.formula_obj, cls.input_obj, cls.input_array_obj):
+            cls.attributeAffects(input_attr, cls.output_obj)
+            cls.attributeAffects(input_attr, cls.output_array_obj)
+
+def initializePlugin(plugin):
+    """
+    加载插件时执行此函数
+    plugin: MObject用于使用MFnPlugin函数集注册插件
+    """
+
+    vendor = "RuiChen"
+    version = "1.0.0"
+
+    plugin_fn = om.MFnPlugin(plugin, vendor, version)
+    try:
+        plugin_fn.registerNode(ExpressionNode.TYPE_NAME,
+                               ExpressionNode.TYPE_ID,
+                               ExpressionNode.creator,
+                               ExpressionNode.initialize,
+                               om.MPxNode.kDependNode)
+    except:
+        om.MGlobal.displayError("Failed to register node: {0}".format(ExpressionNode.TYPE_NAME))
+
+def uninitializePlugin(plugin):
+    """
+    取消加载插件时执行此函数
+    plugin: MObject用于使用MFnPlugin函数集取消注册插件
+    """
+    plugin_fn = om.MFnPlugin(plugin)
+    try:
+        plugin_fn.deregisterNode(ExpressionNode.TYPE_ID)
+    except:
+        om.MGlobal.displayError("Failed to deregister node: {0}".format(ExpressionNode.TYPE_NAME))
+
+if __name__ == "__main__":
+    """
+    测试时使用
+    """
+
+    cmds.file(new=True, force=True)
+
+    plugin_name = "expression_node.py"
+
+    cmds.evalDeferred('if cmds.pluginInfo("{0}", q=True, loaded=True): cmds.unloadPlugin("{0}")'.format(plugin_name))
+    cmds.evalDeferred('if not cmds.pluginInfo("{0}", q=True, loaded=True): cmds.loadPlugin("{0}")'.format(plugin_name))
+
+    # 代替multiplynode和rollingnode: 距离 * 2 / 半径
+    cmds.evalDeferred('cmds.createNode("expressionnode")')
+    cmds.evalDeferred('cmds.setAttr("expressionnode1.formula", "x0 * 2 / max(x1, 0.001)", type="string")')
+    cmds.evalDeferred('cmds.setAttr("expressionnode1.input[0]", 3.0); cmds.setAttr("expressionnode1.input[1]", 1.5)')
+    cmds.evalDeferred('print(cmds.getAttr("expressionnode1.output"))')
@@ -0,0 +1,149 @@
+# coding: utf-8
+# 逐帧保存顶点位置的缓存文件，不依赖maya
+# 文件是64字节的文件头加上(帧数, 顶点数, 3)的float32数组，按帧连续存放，和mesh内部的点数组(getRawPoints)布局一致
+import os
+import struct
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # python2
+
+import numpy as np
+
+MAGIC = b"PTCACHE1"
+VERSION = 1
+HEADER_FORMAT = "<8sIIIdd"  # 标识, 版本, 顶点数, 帧数, 开始帧, 帧间隔
+HEADER_SIZE = 64  # 文件头补齐到64字节，数据按64字节对齐
+
+
+def pack_header(vertex_count, frame_count, start_frame, step):
+    header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, vertex_count, frame_count, start_frame, step)
+    return header + b"\0" * (HEADER_SIZE - len(header))
+
+
+def read_header(file_obj):
+    """
+    Returns:
+        (int, int, float, float): 顶点数, 帧数, 开始帧, 帧间隔
+    """
+    data = file_obj.read(HEADER_SIZE)
+    if len(data) != HEADER_SIZE:
+        raise ValueError("file is too short for a point cache header")
+    magic, version, vertex_count, frame_count, start_frame, step = struct.unpack_from(HEADER_FORMAT, data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a point cache file (version {0})".format(VERSION))
+    return vertex_count, frame_count, start_frame, step
+
+
+class PointCacheWriter(object):
+    """
+        在后台线程中写入缓存文件，计算下一帧的同时把上一帧写入磁盘
+        队列的长度有上限，磁盘跟不上时write_frame会等待，内存中最多保存MAX_PENDING帧
+        close时才把帧数写入文件头，没有正常关闭的文件帧数为0
+    """
+
+    MAX_PENDING = 8
+
+    def __init__(self, file_path, vertex_count, start_frame=1.0, step=1.0):
+        self.file_path = file_path
+        self.vertex_count = vertex_count
+        self.start_frame = start_frame
+        self.step = step
+        self.frame_count = 0  # 已经提交的帧数
+        self.error = None  # 后台线程中的异常，在write_frame和close时抛出
+
+        self.file_obj = open(file_path, "wb")
+        self.file_obj.write(pack_header(vertex_count, 0, start_frame, step))
+
+        self.pending = queue.Queue(PointCacheWriter.MAX_PENDING)
+        self.thread = threading.Thread(target=self.write_loop)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def write_loop(self):
+        while True:
+            frame = self.pending.get()
+            if frame is None:
+                return
+            if self.error is not None:
+                continue  # 出错后丢弃剩余的帧，直到close
+            try:
+                frame.tofile(self.file_obj)
+            except (IOError, OSError) as error:
+                self.error = error
+
+    def write_frame(self, points):
+        """ 提交一帧(n, 3)的顶点位置，转换为float32后交给后台线程写入 """
+        if self.error is not None:
+            raise self.error
+        frame = np.ascontiguousarray(points, dtype=np.float32).reshape(-1, 3)
+        if len(frame) != self.vertex_count:
+            raise ValueError("frame has {0} points, the cache has {1}".format(len(frame), self.vertex_count))
+        if frame is points:
+            frame = frame.copy()  # 调用者可能会重复使用points
+        self.pending.put(frame)
+        self.frame_count += 1
+
+    def close(self):
+        """ 等待所有帧写完，再把帧数写入文件头 """
+        if self.file_obj is None:
+            return
+        self.pending.put(None)
+        self.thread.join()
+        try:
+            if self.error is None:
+                self.file_obj.seek(0)
+                self.file_obj.write(pack_header(self.vertex_count, self.frame_count, self.start_frame, self.step))
+        finally:
+            self.file_obj.close()
+            self.file_obj = None
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # 出错时不覆盖原来的异常，只结束后台线程
+            try:
+                self.close()
+            except (IOError, OSError, ValueError):
+                pass
+
+
+class PointCacheReader(object):
+    """ 通过内存映射读取缓存文件，只有读到的帧才会被操作系统读入内存 """
+
+    def __init__(self, file_path):
+        with open(file_path, "rb") as file_obj:
+            self.vertex_count, self.frame_count, self.start_frame, self.step = read_header(file_obj)
+
+        expected_size = HEADER_SIZE + self.frame_count * self.vertex_count * 3 * 4
+        if os.path.getsize(file_path) < expected_size:
+            raise ValueError("point cache is truncated")
+
+        self.file_path = file_path
+        self.frames = None
+        if self.frame_count and self.vertex_count:
+            self.frames = np.memmap(file_path, dtype=np.float32, mode="r", offset=HEADER_SIZE,
+                                    shape=(self.frame_count, self.vertex_count, 3))
+
+    def frame_index(self, frame):
+        """ 离frame最近的一帧的序号，超出范围时使用第一帧或最后一帧 """
+        index = int(round((frame - self.start_frame) / self.step)) if self.step else 0
+        return min(max(index, 0), self.frame_count - 1)
+
+    def frame(self, frame):
+        """ (n, 3)的float32顶点位置，是内存映射的视图，不复制数据。没有帧时返回None """
+        if self.frames is None:
+            return None
+        return self.frames[self.frame_index(frame)]
+
+    def close(self):
+        """ 释放内存映射，windows上映射没有释放时无法覆盖文件 """
+        self.frames = None
@@ -0,0 +1,153 @@
+# coding: utf-8
+import os
+
+import maya.OpenMaya as om
+import maya.OpenMayaMPx as ommpx
+import maya.cmds as cmds
+
+from deformer_utils import np, point_array_to_numpy, numpy_to_point_array, iterator_indices, BufferPool
+
+if np is not None:
+    from point_cache import PointCacheReader
+
+
+class PointCacheNode(ommpx.MPxDeformerNode):
+    """
+        播放bakePointCache命令保存的缓存文件，不重新计算变形
+        缓存文件通过内存映射读取，一帧的数据整体转换为MPointArray后通过setAllPositions写回
+    """
+
+    TYPE_NAME = "pointcachedeformernode"
+    TYPE_ID = om.MTypeId(0x0007F7FF)
+
+    def __init__(self):
+        super(PointCacheNode, self).__init__()
+
+        self.cache_file = None  # (文件状态, PointCacheReader)
+        self.buffers = BufferPool()  # 在多次计算之间重复使用的数组
+
+    def deform(self, data_block, geo_iter, matrix, multi_index):
+        """
+            把time对应的一帧写入输出
+        Args:
+            data_block (_type_): 数据块
+            geo_iter (_type_): 针对outputgeom的顶点迭代器
+            matrix (_type_): 世界空间的矩阵
+            multi_index (_type_): geom_index
+        """
+        envelope = data_block.inputValue(self.envelope).asFloat() # 总权重
+        if envelope == 0 or np is None:
+            return
+
+        reader = self.open_cache_file(data_block.inputValue(PointCacheNode.cache_file_attr).asString())
+        if reader is None:
+            return
+
+        frame = data_block.inputValue(PointCacheNode.time).asTime().asUnits(om.MTime.uiUnit())
+        points = reader.frame(frame)  # 内存映射的视图，还没有读取数据
+        if points is None:
+            return
+
+        output_handle = data_block.outputArrayValue(ommpx.cvar.MPxGeometryFilter_outputGeom)
+        output_handle.jumpToElement(multi_index)
+        output_geom = output_handle.outputValue().asMesh()
+        if om.MFnMesh(output_geom).numVertices() != len(points):
+            om.MGlobal.displayWarning("{0}: the point cache has {1} points, the mesh has {2}".format(
+                self.name(), len(points), om.MFnMesh(output_geom).numVertices()))
+            return
+
+        # 通过迭代器写回，maya才会知道点改变了(直接修改getRawPoints的数组不会更新mesh的内部状态)
+        positions = points[iterator_indices(geo_iter, len(points))]
+        buffer = self.buffers.array(("output", multi_index), om.MPointArray)
+        if envelope != 1:
+            geo_iter.allPositions(buffer)
+            rest = point_array_to_numpy(buffer)
+            positions = rest + (positions - rest) * envelope
+        geo_iter.setAllPositions(numpy_to_point_array(positions, buffer))
+
+    def open_cache_file(self, file_path):
+        """ 打开缓存文件，文件没有改变时使用已经打开的映射，无法打开时返回None """
+        if not file_path:
+            self.close_cache_file()
+            return None
+
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        file_state = (file_path, stat.st_mtime, stat.st_size)
+
+        if self.cache_file is None or self.cache_file[0] != file_state:
+            self.close_cache_file()
+            try:
+                self.cache_file = (file_state, PointCacheReader(file_path))
+            except (IOError, ValueError) as error:
+                om.MGlobal.displayWarning("Failed to load point cache from {0}: {1}".format(file_path, error))
+                return None
+        return self.cache_file[1]
+
+    def close_cache_file(self):
+        """ 释放内存映射，windows上需要先释放才能重新烘焙同一个文件 """
+        if self.cache_file is not None:
+            self.cache_file[1].close()
+            self.cache_file = None
+
+    @classmethod
+    def creator(cls):
+        return PointCacheNode()
+
+    @classmethod
+    def initialize(cls):
+        typed_attr = om.MFnTypedAttribute()
+        cls.cache_file_attr = typed_attr.create("cacheFile", "cFile", om.MFnData.kString)
+        typed_attr.setUsedAsFilename(True)
+
+        unit_attr = om.MFnUnitAttribute()
+        cls.time = unit_attr.create("time", "tm", om.MFnUnitAttribute.kTime, 0.0)  # 连接time1.outTime
+
+        cls.addAttribute(cls.cache_file_attr)
+        cls.addAttribute(cls.time)
+
+        output_geom = ommpx.cvar.MPxGeometryFilter_outputGeom
+
+        cls.attributeAffects(cls.cache_file_attr, output_geom)
+        cls.attributeAffects(cls.time, output_geom)
+
+def initializePlugin(plugin):
+    """ 插件加载时执行这个函数"""
+    vendor = "RuiChen"  # 插件制作人的名字
+    version = "1.0.0"  # 插件的版本
+
+    plugin_fn = ommpx.MFnPlugin(plugin, vendor, version)  # 定义插件
+
+    try:
+        plugin_fn.registerNode(PointCacheNode.TYPE_NAME,
+                               PointCacheNode.TYPE_ID,
+                               PointCacheNode.creator,
+                               PointCacheNode.initialize,
+                               ommpx.MPxNode.kDeformerNode)
+    except:
+        om.MGlobal.displayError("Failed to register node: {0}".format(PointCacheNode.TYPE_NAME))
+
+def uninitializePlugin(plugin):
+    """ 插件取消加载时执行这个函数"""
+    plugin_fn = ommpx.MFnPlugin(plugin)
+    try:
+        plugin_fn.deregisterNode(PointCacheNode.TYPE_ID)
+    except:
+        om.MGlobal.displayError("Failed to deregister node: {0}".format(PointCacheNode.TYPE_NAME))
+
+if __name__ == '__main__':
+    cmds.file(new=True,f=True)
+    plugin_name = "point_cache_node.py"  # 插件的文件名
+    # 如果插件加载了就先取消加载插件
+    cmds.evalDeferred(
+        'if cmds.pluginInfo("{0}", q=True, loaded=True): cmds.unloadPlugin("{0}")'.format(plugin_name))
+    # 如果插件没有加载就加载插件
+    cmds.evalDeferred(
+        'if not cmds.pluginInfo("{0}", q=True, loaded=True): cmds.loadPlugin("{0}")'.format(plugin_name))
+
+    cmds.evalDeferred('cmds.polySphere()')
+    cmds.evalDeferred('cmds.deformer("pSphere1", typ="pointcachedeformernode")')
+    cmds.evalDeferred('cmds.connectAttr("time1.outTime", "pointcachedeformernode1.time")')
+    cmds.evalDeferred('cmds.setAttr("pointcachedeformernode1.cacheFile", "C:/Users/Administrator/Documents/maya/2018/plug-ins/test_scene/attractor_test.ptc", type="string")')
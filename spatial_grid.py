@@ -0,0 +1,193 @@
+# coding: utf-8
+# 不依赖maya的均匀网格空间索引，用来快速找出某个球形范围内的顶点
+import numpy as np
+
+
+class UniformGrid(object):
+    """
+        把所有点按所在的网格单元排序，查询时只检查和球的包围盒相交的网格单元
+        网格只在点的位置改变时重建，查询的开销只和范围内的点数有关
+    """
+
+    POINTS_PER_CELL = 8  # 平均每个网格单元中的点数
+
+    NEAREST_CHUNK_SIZE = 4096  # nearest每次批量查询的点数，限制候选组合的内存
+
+    def __init__(self, points, cell_size=None, points_per_cell=POINTS_PER_CELL):
+        """
+        Args:
+            points (numpy.ndarray): (n, 3)的点的位置
+            cell_size (float): 网格单元的边长，为None时根据点的密度自动计算
+            points_per_cell (float): 自动计算单元大小时，期望的平均每个非空网格单元中的点数
+        """
+        self.points = np.ascontiguousarray(points, dtype=np.float64).reshape(-1, 3)
+        count = len(self.points)
+
+        if count == 0:
+            self.bounds_min = np.zeros(3)
+            bounds_size = np.zeros(3)
+        else:
+            self.bounds_min = self.points.min(axis=0)
+            bounds_size = self.points.max(axis=0) - self.bounds_min
+
+        if cell_size is None:
+            # 按照包围盒的体积和点数估算单元大小，避免扁平的模型得到0体积
+            extent = np.maximum(bounds_size, bounds_size.max() * 1e-3 + 1e-9)
+            cell_size = (np.prod(extent) * points_per_cell / max(count, 1)) ** (1.0 / 3.0)
+
+            # 模型的顶点都在表面上，大部分单元是空的，按非空单元的平均点数缩小单元(按表面的面积缩放)
+            for _ in range(3):
+                self.build(bounds_size, cell_size)
+                occupancy = count / float(max(np.count_nonzero(np.diff(self.sorted_keys)) + 1, 1))
+                if occupancy <= 2 * points_per_cell:
+                    return
+                cell_size *= (points_per_cell / occupancy) ** 0.5
+
+        self.build(bounds_size, cell_size)
+
+    def build(self, bounds_size, cell_size):
+        """ 按照单元大小把所有点排序 """
+        self.cell_size = float(max(cell_size, 1e-9))
+
+        self.dims = np.floor(bounds_size / self.cell_size).astype(np.int64) + 1 # 每个轴向上的网格数
+
+        cell_keys = self.cell_key(self.cell_coords(self.points))
+        self.order = np.argsort(cell_keys, kind="stable").astype(np.intp)  # 按网格单元排序后的点序号
+        self.sorted_keys = cell_keys[self.order]
+
+    def __len__(self):
+        return len(self.points)
+
+    def cell_coords(self, points):
+        """ 点所在的网格单元坐标 """
+        coords = np.floor((points - self.bounds_min) / self.cell_size).astype(np.int64)
+        return np.clip(coords, 0, self.dims - 1)
+
+    def cell_key(self, coords):
+        """ 把网格单元坐标转换为一维的序号, z轴方向上相邻的单元序号也相邻 """
+        return (coords[..., 0] * self.dims[1] + coords[..., 1]) * self.dims[2] + coords[..., 2]
+
+    def query_box(self, box_min, box_max):
+        """ 返回和包围盒相交的网格单元中的所有点的序号(候选点，还需要精确判断) """
+        box_min = np.asarray(box_min, dtype=np.float64)
+        box_max = np.asarray(box_max, dtype=np.float64)
+        if len(self.points) == 0 or np.any(box_max < self.bounds_min) or \
+                np.any(box_min > self.bounds_min + self.dims * self.cell_size):
+            return np.empty(0, dtype=np.intp)
+
+        lo = self.cell_coords(box_min)
+        hi = self.cell_coords(box_max)
+
+        # 每个(x, y)列在z轴方向上的单元序号是连续的，所以每一列只需要一次二分查找
+        xs, ys = np.meshgrid(np.arange(lo[0], hi[0] + 1), np.arange(lo[1], hi[1] + 1), indexing="ij")
+        column_keys = (xs.ravel() * self.dims[1] + ys.ravel()) * self.dims[2]
+        starts = np.searchsorted(self.sorted_keys, column_keys + lo[2], side="left")
+        ends = np.searchsorted(self.sorted_keys, column_keys + hi[2], side="right")
+
+        return self.order[concatenate_ranges(starts, ends)]
+
+    def query_sphere(self, center, radius):
+        """ 返回距离center不超过radius的所有点的序号 """
+        center = np.asarray(center, dtype=np.float64)
+        candidates = self.query_box(center - radius, center + radius)
+        if candidates.size == 0:
+            return candidates
+
+        offsets = self.points[candidates] - center
+        inside = np.einsum("ij,ij->i", offsets, offsets) <= radius * radius
+        return np.sort(candidates[inside])
+
+    def nearest(self, queries):
+        """
+            查询每个点最近的网格中的点
+        Args:
+            queries (numpy.ndarray): (m, 3)的查询点
+        Returns:
+            (numpy.ndarray, numpy.ndarray): 最近点的序号，到最近点的距离
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.float64).reshape(-1, 3)
+        indices = np.full(len(queries), -1, dtype=np.intp)
+        distances = np.full(len(queries), np.inf)
+        if len(self.points) == 0:
+            return indices, distances
+
+        for start in range(0, len(queries), UniformGrid.NEAREST_CHUNK_SIZE):
+            chunk = slice(start, start + UniformGrid.NEAREST_CHUNK_SIZE)
+            indices[chunk], distances[chunk] = self.nearest_chunk(queries[chunk])
+        return indices, distances
+
+    def nearest_chunk(self, queries):
+        """
+            从每个查询点所在的单元开始，检查周围ring圈内的单元
+            找到的最近点比没有检查过的单元更近时结果就是准确的，否则扩大ring继续查找
+        """
+        indices = np.full(len(queries), -1, dtype=np.intp)
+        distances = np.full(len(queries), np.inf)
+        coords = self.cell_coords(queries)
+
+        pending = np.arange(len(queries))
+        ring = 1
+        while pending.size:
+            lo = coords[pending] - ring
+            hi = coords[pending] + ring
+
+            # 没有检查过的单元到查询点的最小距离，已经检查到网格边界的方向上为无穷大
+            lo_gaps = queries[pending] - (self.bounds_min + lo * self.cell_size)
+            hi_gaps = (self.bounds_min + (hi + 1) * self.cell_size) - queries[pending]
+            lo_gaps[lo <= 0] = np.inf
+            hi_gaps[hi >= self.dims - 1] = np.inf
+            bounds = np.minimum(lo_gaps.min(axis=1), hi_gaps.min(axis=1))
+
+            lo = np.clip(lo, 0, self.dims - 1)
+            hi = np.clip(hi, 0, self.dims - 1)
+
+            # 每个查询点检查(2*ring+1)^2列，每列在z轴方向上是连续的一段
+            offsets = np.arange(-ring, ring + 1)
+            xs = coords[pending, 0][:, np.newaxis, np.newaxis] + offsets[np.newaxis, :, np.newaxis]
+            ys = coords[pending, 1][:, np.newaxis, np.newaxis] + offsets[np.newaxis, np.newaxis, :]
+            valid = (xs >= 0) & (xs < self.dims[0]) & (ys >= 0) & (ys < self.dims[1])
+            column_keys = (xs * self.dims[1] + ys) * self.dims[2]
+            starts = np.searchsorted(self.sorted_keys, (column_keys + lo[:, 2, np.newaxis, np.newaxis]).ravel(), side="left")
+            ends = np.searchsorted(self.sorted_keys, (column_keys + hi[:, 2, np.newaxis, np.newaxis]).ravel(), side="right")
+            ends = np.where(valid.ravel(), ends, starts)
+
+            # 区间是按查询点的顺序排列的，所以每个查询点的候选点在结果中是连续的一段
+            candidate_counts = np.maximum(ends - starts, 0).reshape(len(pending), -1).sum(axis=1)
+            candidates = self.order[concatenate_ranges(starts, ends)]
+
+            if candidates.size:
+                owners = np.repeat(np.arange(len(pending)), candidate_counts)
+                offsets = self.points[candidates] - queries[pending[owners]]
+                candidate_distances = np.einsum("ij,ij->i", offsets, offsets)
+
+                # 每个查询点取距离最小的候选点
+                found = np.flatnonzero(candidate_counts)
+                group_starts = np.concatenate([[0], np.cumsum(candidate_counts[found])[:-1]])
+                minimum = np.minimum.reduceat(candidate_distances, group_starts)
+                is_minimum = candidate_distances == np.repeat(minimum, candidate_counts[found])
+                _, first = np.unique(owners[is_minimum], return_index=True)
+                indices[pending[found]] = candidates[np.flatnonzero(is_minimum)[first]]
+                distances[pending[found]] = np.sqrt(minimum)
+
+            pending = pending[~(distances[pending] <= bounds)]
+            ring *= 2
+
+        return indices, distances
+
+
+def concatenate_ranges(starts, ends):
+    """ 把多个[start, end)区间拼接成一个序号数组，不使用python循环 """
+    lengths = ends - starts
+    valid = lengths > 0
+    starts = starts[valid]
+    lengths = lengths[valid]
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.intp)
+
+    # 每个区间第一个元素的位置上加上和前一个区间的偏移，累加后就是所有的序号
+    steps = np.ones(total, dtype=np.intp)
+    heads = np.cumsum(lengths)[:-1]
+    steps[0] = starts[0]
+    steps[heads] = starts[1:] - (starts[:-1] + lengths[:-1] - 1)
+    return np.cumsum(steps)